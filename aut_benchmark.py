@@ -0,0 +1,252 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import pandas as pd
+from datetime import datetime
+
+import aut_cache
+import aut_cleanup_wd_file
+import aut_cleaup_eop_file
+import aut_join_files
+import aut_metrics
+import aut_reconcile
+import aut_synthetic_data
+from aut_filters import apply_filters
+from aut_logging import get_logger
+
+# === CONFIGURATION ===
+results_dir = os.path.join(os.getcwd(), "PY - Logs")
+baseline_file = "benchmark_baseline.json"
+DEFAULT_SIZES = [10_000, 100_000]
+TOLERANCE = 0.25        # a job or stage slower than baseline * (1 + TOLERANCE) is a regression
+MIN_COMPARED_S = 0.05   # shorter timings are noise and not compared
+JOBS = ["wd", "eop", "join"]
+
+
+def point_pipeline_at(base_dir, echo=False):
+    """Redirects the input, output, report and log folders of all three scripts to base_dir."""
+    wd_folder = os.path.join(base_dir, "PY - Data - WD original")
+    eop_folder = os.path.join(base_dir, "PY - Data - EOPWD")
+    log_dir = os.path.join(base_dir, "PY - Logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    aut_cleanup_wd_file.INPUT_FOLDER = wd_folder
+    aut_cleanup_wd_file.OUTPUT_FOLDER = eop_folder
+    aut_cleanup_wd_file.LOG_DIR = log_dir
+    aut_cleanup_wd_file.LOG_FILE = os.path.join(log_dir, "processing_log_2.txt")
+    aut_cleanup_wd_file.MANIFEST_FILE = os.path.join(log_dir, "wd_processed.json")
+    aut_cleanup_wd_file.log = get_logger(aut_cleanup_wd_file.LOG_FILE, echo)
+
+    aut_cleaup_eop_file.watch_dir = eop_folder
+    aut_cleaup_eop_file.log_dir = log_dir
+    aut_cleaup_eop_file.log = get_logger(os.path.join(log_dir, aut_cleaup_eop_file.log_file), echo)
+
+    aut_join_files.watch_dir = eop_folder
+    aut_join_files.log_dir = log_dir
+    aut_join_files.log_path = os.path.join(log_dir, aut_join_files.log_file)
+    aut_join_files.log = get_logger(aut_join_files.log_path, echo)
+
+    aut_reconcile.report_dir = os.path.join(base_dir, "PY - Data - Reconciliation")
+    aut_reconcile.type_mapping_path = os.path.join(wd_folder, aut_synthetic_data.WD_TYPE_MAPPING_NAME)
+    aut_metrics.report_dir = log_dir
+    aut_cache.cache_dir = os.path.join(base_dir, "PY - Cache")
+
+
+def _last_report(run_name):
+    reports = glob.glob(os.path.join(aut_metrics.report_dir, f"run_report_{run_name}_*.json"))
+    if not reports:
+        return None
+    with open(max(reports, key=os.path.getmtime), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _summary(run_name, wall_s, output):
+    """Wall time of the whole job plus the stages from its run report."""
+    report = _last_report(run_name) or {"stages": []}
+    ok = output is not None and all(s["status"] == "ok" for s in report["stages"])
+    return {
+        "status": "ok" if ok else "error",
+        "wall_s": round(wall_s, 3),
+        "peak_rss_mb": report.get("peak_rss_mb"),
+        "stages": {s["stage"]: {k: s.get(k) for k in ("wall_s", "cpu_s", "rows_in", "rows_out", "peak_rss_mb")}
+                   for s in report["stages"]},
+    }
+
+
+def _remove(pattern):
+    for path in glob.glob(pattern):
+        os.remove(path)
+
+
+def _newest(pattern):
+    paths = glob.glob(pattern)
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_files(paths):
+    """Times process_file, process_files and append_new_to_sap on the generated files (one chain)."""
+    eop_folder = os.path.dirname(paths["sap_table"])
+    results = {}
+
+    _remove(os.path.join(eop_folder, "Table_WD_*.xlsx"))
+    _, wall = _timed(aut_cleanup_wd_file.process_file, paths["wd_export"])
+    wd_path = _newest(os.path.join(eop_folder, "Table_WD_*.xlsx"))
+    results["wd"] = _summary("wd", wall, wd_path)
+    if wd_path is None:
+        return results
+
+    _remove(os.path.join(eop_folder, "SAP_Expanded*.xlsx"))
+    _, wall = _timed(aut_cleaup_eop_file.process_files, wd_path)
+    expanded_path = _newest(os.path.join(eop_folder, "SAP_Expanded*.xlsx"))
+    results["eop"] = _summary("eop", wall, expanded_path)
+    if expanded_path is None:
+        return results
+
+    _remove(os.path.join(eop_folder, "Table_SAP_*.xlsx"))
+    _, wall = _timed(aut_join_files.append_new_to_sap, expanded_path, paths["sap_table"])
+    results["join"] = _summary("join", wall, _newest(os.path.join(eop_folder, "Table_SAP_*.xlsx")))
+    return results
+
+
+def bench_in_memory(sap_df, wd_export_df):
+    """
+    Same chain without the Excel files, for sizes above the worksheet limit:
+    WD filters, SAP expansion and the join (combine, CoCd filter, dedup) on the generated frames.
+    """
+    results = {}
+    wd_df = wd_export_df.drop(columns=aut_synthetic_data.WD_COLUMNS_TO_DELETE)
+    cutoff = aut_cleanup_wd_file.wd_cutoff()
+    start = time.perf_counter()
+    with aut_metrics.stage("wd.load_filter", len(wd_df)) as st:
+        wd_df, _ = apply_filters(wd_df, aut_cleanup_wd_file.wd_filters(cutoff))
+        st["rows_out"] = len(wd_df)
+    aut_metrics.write_run_report("wd")
+    results["wd"] = _summary("wd", time.perf_counter() - start, wd_df)
+
+    expanded, wall = _timed(aut_cleaup_eop_file.build_expanded_table, sap_df, wd_df)
+    aut_metrics.write_run_report("eop")
+    results["eop"] = _summary("eop", wall, expanded)
+
+    _, wall = _timed(aut_join_files.combine_with_sap, sap_df, expanded, sap_df.columns.tolist())
+    aut_metrics.write_run_report("join")
+    results["join"] = _summary("join", wall, expanded)
+    return results
+
+
+def _fastest(runs):
+    """Per job, the repetition with the lowest wall time."""
+    return {job: min((r[job] for r in runs if job in r), key=lambda s: s["wall_s"])
+            for job in JOBS if any(job in r for r in runs)}
+
+
+def run_benchmark(sizes, open_ended_share=0.02, duplicate_share=0.05, repeat=1, seed=0, work_dir=None):
+    work_dir = work_dir or tempfile.mkdtemp(prefix="py_benchmark_")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"open_ended_share": open_ended_share, "duplicate_share": duplicate_share,
+                   "repeat": repeat, "seed": seed},
+        "sizes": {},
+    }
+    for n in sizes:
+        base_dir = os.path.join(work_dir, str(n))
+        point_pipeline_at(base_dir)
+        in_memory = n + 1 > aut_synthetic_data.EXCEL_MAX_ROWS
+        print(f"⏳ {n} rows: generating data ({'in memory' if in_memory else 'xlsx files'})")
+        if in_memory:
+            sap_df = aut_synthetic_data.make_sap_table(n, open_ended_share, duplicate_share, seed=seed)
+            wd_df = aut_synthetic_data.make_wd_export(n, sap_df, duplicate_share, seed=seed)
+            runs = [bench_in_memory(sap_df, wd_df) for _ in range(repeat)]
+        else:
+            paths = aut_synthetic_data.generate(base_dir, n, n, open_ended_share, duplicate_share, seed)
+            runs = [bench_files(paths) for _ in range(repeat)]
+        results["sizes"][str(n)] = {"mode": "in_memory" if in_memory else "files", **_fastest(runs)}
+        for job, res in results["sizes"][str(n)].items():
+            if job in JOBS:
+                print(f"   {job:<5} {res['wall_s']:>9.3f} s  {res['status']}")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Returns one line per job or stage that got slower than the baseline allows."""
+    regressions = []
+    for size, jobs in results["sizes"].items():
+        base_jobs = baseline.get("sizes", {}).get(size, {})
+        for job in JOBS:
+            if job not in jobs or job not in base_jobs:
+                continue
+            timings = [(job, jobs[job]["wall_s"], base_jobs[job]["wall_s"])]
+            for name, st in jobs[job]["stages"].items():
+                base_st = base_jobs[job]["stages"].get(name)
+                if base_st:
+                    timings.append((name, st["wall_s"], base_st["wall_s"]))
+            for name, now, before in timings:
+                if before >= MIN_COMPARED_S and now > before * (1 + tolerance):
+                    regressions.append(f"{size} rows, {name}: {now:.3f} s vs baseline {before:.3f} s "
+                                       f"(+{(now / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks the WD cleanup, SAP expansion and join on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="SAP and WD rows per run")
+    parser.add_argument("--open-ended", type=float, default=0.02)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size, the fastest one is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="keep the generated files here (default: temp folder, removed)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the results as {baseline_file}")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--read-cache", action="store_true",
+                        help="keep the parsed-input cache on (repeats then measure cached reads)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    aut_cache.read_cache_enabled = args.read_cache
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="py_benchmark_")
+    try:
+        results = run_benchmark(args.rows, args.open_ended, args.duplicates, args.repeat, args.seed, work_dir)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(results_dir, exist_ok=True)
+    results_path = os.path.join(results_dir, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved: {results_path}")
+
+    baseline_path = os.path.join(results_dir, baseline_file)
+    regressions = []
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if not regressions:
+            print("✅ No regressions against the baseline")
+    if args.save_baseline:
+        shutil.copyfile(results_path, baseline_path)
+        print(f"💾 Baseline saved: {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import os
+import glob
+import json
+import hashlib
+import tempfile
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from aut_watcher import file_key
+
+try:
+    import fcntl
+except ImportError:  # Windows: msvcrt locks the first byte of the lock file instead
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow  # Arrow IPC files for the parsed-input cache
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+# === CONFIGURATION ===
+cache_dir = os.path.join(os.getcwd(), "PY - Cache")
+enabled = True
+max_age_days = 14      # artifacts not used for this long are removed
+max_total_mb = 2048    # above this, the least recently used artifacts are removed
+index_file = "cache_index.json"         # content hashes + stage artifacts
+run_manifest_file = "run_manifest.json"  # inputs, config and stage keys of the last run
+
+# Parsed-input cache (read_through / read_excel): parsed xlsx inputs kept as Arrow IPC files
+read_cache_enabled = True
+read_cache_max_mb = 1024   # least recently used parsed files are removed above this
+read_index_file = "read_index.json"
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+HASH_BLOCK = 1 << 20
+
+_code_hash = None
+
+
+def code_hash():
+    """Hash of the pipeline scripts: any code change invalidates every cached artifact."""
+    global _code_hash
+    if _code_hash is None:
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(CODE_DIR, "*.py"))):
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _code_hash = h.hexdigest()
+    return _code_hash
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _digest(hashes, path):
+    """sha256 of the file; reused from hashes (file_key -> digest) while path, size and mtime are unchanged."""
+    key = file_key(path)
+    digest = hashes.get(key)
+    if digest is None:
+        digest = _sha256_file(path)
+        # Older versions of the same file are never looked up again
+        prefix = os.path.abspath(path) + "|"
+        for old_key in [k for k in hashes if k.startswith(prefix)]:
+            del hashes[old_key]
+        hashes[key] = digest
+    return digest
+
+
+def _replace_atomic(path, write):
+    """write(tmp_path) to a temp file of its own next to path, then rename it to path."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    _replace_atomic(path, write)
+
+
+@contextmanager
+def _locked(name):
+    """
+    Exclusive lock on <name>.lock in cache_dir, held across processes: pool workers and parallel
+    runs load, change and write an index one at a time, so no update is lost.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, name + ".lock"), "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _load_json(name, default):
+    path = os.path.join(cache_dir, name)
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index():
+    return _load_json(index_file, {"hashes": {}, "artifacts": {}})
+
+
+def evict(entries, max_mb, max_age=None, now=None):
+    """
+    Removes entries not used for max_age days (if given), then the least recently used ones
+    until the files fit in max_mb. Returns the number of removed entries.
+    """
+    now = now or datetime.now()
+    oldest = (now - timedelta(days=max_age)).isoformat(timespec="seconds") if max_age is not None else ""
+    removed = 0
+    by_use = sorted(entries, key=lambda k: entries[k]["last_used"])
+    total = sum(a["bytes"] for a in entries.values())
+    for key in by_use:
+        entry = entries[key]
+        if entry["last_used"] >= oldest and total <= max_mb * 2**20:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, entry["artifact"]))
+        except FileNotFoundError:
+            pass
+        total -= entry["bytes"]
+        del entries[key]
+        removed += 1
+    return removed
+
+
+class RunCache:
+    """
+    Run manifest and stage memoization for one pipeline run.
+    stage_key() hashes a stage's input files (by content), its config and the keys of the stages
+    it builds on; load() returns the artifact stored under that key by an earlier run, store()
+    keeps a new one. Input content hashes are reused while a file's path, size and mtime stay
+    the same, so unchanged inputs are not read at all.
+    save() merges this run's changes into the index on disk, so parallel runs keep each other's.
+    """
+
+    def __init__(self):
+        os.makedirs(cache_dir, exist_ok=True)
+        with _locked(index_file):
+            self.index = load_index()
+        self.loaded_hashes = dict(self.index["hashes"])
+        self.touched = set()  # artifact keys stored or used by this run
+        self.run = {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "code": code_hash(),
+            "inputs": {},
+            "stages": {},
+        }
+
+    def input_hash(self, path):
+        digest = _digest(self.index["hashes"], path)
+        self.run["inputs"][os.path.abspath(path)] = digest
+        return digest
+
+    def stage_key(self, name, inputs=(), config=None, upstream=()):
+        payload = {
+            "stage": name,
+            "code": code_hash(),
+            "inputs": [self.input_hash(p) for p in inputs],
+            "config": config,
+            "upstream": list(upstream),
+        }
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        self.run["stages"][name] = {
+            "key": key,
+            "inputs": [os.path.basename(p) for p in inputs],
+            "config": config,
+            "cached": False,
+        }
+        return key
+
+    def load(self, name, key):
+        """Returns (DataFrame, output paths) stored under key, or None."""
+        entry = self.index["artifacts"].get(key)
+        if not enabled or entry is None:
+            return None
+        path = os.path.join(cache_dir, entry["artifact"])
+        try:
+            df = pd.read_pickle(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        entry["last_used"] = datetime.now().isoformat(timespec="seconds")
+        self.touched.add(key)
+        self.run["stages"][name]["cached"] = True
+        return df, entry["outputs"]
+
+    def store(self, name, key, df, outputs=()):
+        """Keeps df under key (with the files the stage wrote), then evicts old artifacts."""
+        if not enabled:
+            return
+        artifact = f"{name}_{key[:16]}.pkl"
+        path = os.path.join(cache_dir, artifact)
+        _replace_atomic(path, df.to_pickle)
+        now = datetime.now().isoformat(timespec="seconds")
+        self.index["artifacts"][key] = {
+            "stage": name,
+            "artifact": artifact,
+            "outputs": [os.path.abspath(p) for p in outputs],
+            "bytes": os.path.getsize(path),
+            "created": now,
+            "last_used": now,
+        }
+        self.touched.add(key)
+        self.save()
+
+    def save(self):
+        """
+        Writes the cache index and the run manifest. The index is re-read under the lock and only
+        this run's hashes and artifacts are merged in, then old artifacts are evicted.
+        """
+        with _locked(index_file):
+            index = load_index()
+            for key in self.loaded_hashes.keys() - self.index["hashes"].keys():
+                # older versions of a file this run hashed again (see _digest)
+                index["hashes"].pop(key, None)
+            for key, digest in self.index["hashes"].items():
+                if self.loaded_hashes.get(key) != digest:
+                    index["hashes"][key] = digest
+            for key in self.touched:
+                if key in self.index["artifacts"]:
+                    index["artifacts"][key] = self.index["artifacts"][key]
+            evict(index["artifacts"], max_total_mb, max_age_days)
+            _write_json(os.path.join(cache_dir, index_file), index)
+            _write_json(os.path.join(cache_dir, run_manifest_file), self.run)
+            self.index = index
+            self.loaded_hashes = dict(index["hashes"])
+            self.touched = set()
+
+
+# === Parsed-input cache ===
+def save_frame(df, base_path):
+    """Arrow IPC (uncompressed, so it can be memory-mapped); pickle where Arrow cannot hold a column."""
+    if pyarrow is not None:
+        try:
+            _replace_atomic(base_path + ".arrow", lambda tmp_path: df.to_feather(tmp_path, compression="uncompressed"))
+            return base_path + ".arrow"
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            # e.g. an object column mixing numbers and text
+            pass
+    _replace_atomic(base_path + ".pkl", df.to_pickle)
+    return base_path + ".pkl"
+
+
+def load_frame(path):
+    if path.endswith(".arrow"):
+        # Memory-mapped: numeric columns without nulls are used without a copy
+        return pyarrow.feather.read_table(path, memory_map=True).to_pandas()
+    return pd.read_pickle(path)
+
+
+def read_through(path, reader, *args, **kwargs):
+    """
+    Returns reader(path, *args, **kwargs) (a DataFrame), from the cache when the same file
+    content was read the same way before. Entries are keyed by the content hash, which is only
+    recomputed when the path, size or mtime changed, so a touched or copied file is still a hit.
+    """
+    if not read_cache_enabled:
+        return reader(path, *args, **kwargs)
+    index_path = os.path.join(cache_dir, read_index_file)
+    call = [f"{reader.__module__}.{reader.__qualname__}", args, kwargs, code_hash()]
+
+    # The index is only changed under the lock; parsing and loading the files run outside of it
+    with _locked(read_index_file):
+        index = _load_json(read_index_file, {"hashes": {}, "reads": {}})
+        key = hashlib.sha256(json.dumps([_digest(index["hashes"], path), call], sort_keys=True,
+                                        default=repr).encode()).hexdigest()
+        entry = index["reads"].get(key)
+        if entry is not None:
+            entry["last_used"] = datetime.now().isoformat(timespec="seconds")
+        _write_json(index_path, index)
+
+    if entry is not None:
+        try:
+            return load_frame(os.path.join(cache_dir, entry["artifact"]))
+        except (OSError, EOFError, ValueError):
+            # Evicted by another process meanwhile, or unreadable: parse again
+            pass
+
+    df = reader(path, *args, **kwargs)
+    artifact = save_frame(df, os.path.join(cache_dir, f"read_{key[:16]}"))
+    with _locked(read_index_file):
+        index = _load_json(read_index_file, {"hashes": {}, "reads": {}})
+        now = datetime.now().isoformat(timespec="seconds")
+        index["reads"][key] = {
+            "file": os.path.basename(path),
+            "artifact": os.path.basename(artifact),
+            "bytes": os.path.getsize(artifact),
+            "created": now,
+            "last_used": now,
+        }
+        evict(index["reads"], read_cache_max_mb)
+        _write_json(index_path, index)
+    return df
+
+
+def read_excel(path, **kwargs):
+    """pd.read_excel through the parsed-input cache."""
+    return read_through(path, pd.read_excel, **kwargs)
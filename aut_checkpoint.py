@@ -0,0 +1,111 @@
+import os
+import json
+import uuid
+from datetime import datetime
+from aut_cache import load_frame, save_frame
+
+# === CONFIGURATION ===
+checkpoint_dir = os.path.join(os.getcwd(), "PY - Checkpoints")
+status_file = "pipeline_status.json"
+
+# Pipeline stages in run order (main.py)
+STAGES = ["wd", "eop", "join"]
+
+
+def _status_path():
+    return os.path.join(checkpoint_dir, status_file)
+
+
+def _save_status(status):
+    tmp_path = _status_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, _status_path())
+
+
+def load_status():
+    if not os.path.exists(_status_path()):
+        return None
+    with open(_status_path(), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remove_frames(status):
+    for record in status.get("stages", {}).values():
+        if record.get("frame"):
+            try:
+                os.remove(os.path.join(checkpoint_dir, record["frame"]))
+            except FileNotFoundError:
+                pass
+
+
+def start_run(options=None):
+    """New status record; the checkpoints of the previous run are dropped."""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    previous = load_status()
+    if previous:
+        _remove_frames(previous)
+    status = {
+        "run_id": uuid.uuid4().hex[:12],
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "options": options or {},
+        "finished": None,
+        "stages": {},
+    }
+    _save_status(status)
+    return status
+
+
+def first_incomplete(status):
+    """Name of the first stage without a complete checkpoint, None when the run finished."""
+    for name in STAGES:
+        if status["stages"].get(name, {}).get("status") != "done":
+            return name
+    return None
+
+
+def save_stage(status, name, df=None, **info):
+    """
+    Checkpoints one finished stage: df (if any) is written first, then the status record, both
+    atomically; a stage only counts as done once its frame is complete on disk.
+    info holds what later stages need (paths, keys) and must be JSON serializable.
+    """
+    frame = None
+    if df is not None:
+        frame = os.path.basename(save_frame(df, os.path.join(checkpoint_dir, f"{status['run_id']}_{name}")))
+    status["stages"][name] = {
+        "status": "done",
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "frame": frame,
+        **info,
+    }
+    _save_status(status)
+
+
+def mark_failed(status, name, error):
+    status["stages"][name] = {
+        "status": "failed",
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "error": str(error),
+    }
+    _save_status(status)
+
+
+def load_stage(status, name):
+    """(DataFrame or None, status record) of a done stage; None if the stage has to run (again)."""
+    record = status["stages"].get(name)
+    if not record or record.get("status") != "done":
+        return None
+    if record.get("frame") is None:
+        return None, record
+    try:
+        return load_frame(os.path.join(checkpoint_dir, record["frame"])), record
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def finish_run(status):
+    """Marks the run complete; its frames are no longer needed for a resume."""
+    _remove_frames(status)
+    status["finished"] = datetime.now().isoformat(timespec="seconds")
+    _save_status(status)
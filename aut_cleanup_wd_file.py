@@ -1,7 +1,20 @@
 import os
-import time
+import json
+import argparse
 import pandas as pd
 from datetime import datetime
+import aut_cache
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+from aut_dedup import drop_duplicate_keys, occurrence
+from aut_filters import Predicate, apply_filters, not_blank
+from aut_schema import DATE_FORMATS, WD_COLUMNS, apply_schema
+from aut_logging import get_logger
+from aut_metrics import stage, write_run_report
+from aut_watcher import file_key, wait_for_complete
+from aut_output import TableWriter, with_format, write_table
+from aut_partition import map_in_pool
 
 # === CONFIGURATION ===
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,112 +22,357 @@ INPUT_FOLDER = os.path.join(BASE_DIR, "PY - Data - WD original")
 OUTPUT_FOLDER = os.path.join(BASE_DIR, "PY - Data - EOPWD")
 LOG_DIR = os.path.join(BASE_DIR, "PY - Logs")
 LOG_FILE = os.path.join(LOG_DIR, "processing_log_2.txt")
+MANIFEST_FILE = os.path.join(LOG_DIR, "wd_processed.json")  # exports already cleaned (path, size, mtime)
 MAPPING_FILENAME = "WD - ColumnMapping.xlsx"
 ALLOWED_COUNTRIES = {"Netherlands", "Germany", "Luxembourg"}
+CUTOFF_MONTHS = 3    # time off later than today + CUTOFF_MONTHS is dropped
 FILE_NAME_PART = "Absence - EUR - Time Offs Report"
-CHECK_INTERVAL = 10  # seconds
+CHECK_INTERVAL = 10  # seconds, only used when inotify is not available
+HEADER_ROW = 14      # header row of the WD export (same as pd.read_excel(skiprows=13))
+CHUNK_ROWS = 20000   # rows converted and filtered at a time
+STREAMING = True     # process_file writes each cleaned chunk right away (xlsx only); False: build the whole table first
+OUTPUT_FORMAT = "xlsx"  # Table_WD_ddmm.<format>: xlsx, csv, parquet or feather (see aut_output)
+BATCH_WORKERS = min(4, os.cpu_count() or 1)  # exports cleaned at the same time in batch mode
 
 
 # === Ensure folders exist ===
+os.makedirs(INPUT_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
 
 
-def log(msg):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    entry = f"[{timestamp}] {msg}"
-    print(entry)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(entry + "\n")
+log = get_logger(LOG_FILE)
 
 
-# === Find latest matching input file ===
-def find_latest_matching_file():
+# === Find matching input files ===
+def find_matching_files():
+    """All WD exports in INPUT_FOLDER, oldest first."""
     candidates = []
     for f in os.listdir(INPUT_FOLDER):
         if f.endswith(".xlsx") and MAPPING_FILENAME not in f and FILE_NAME_PART in f:
             full_path = os.path.join(INPUT_FOLDER, f)
             mod_time = os.path.getmtime(full_path)
             candidates.append((mod_time, full_path))
-    return max(candidates, key=lambda x: x[0])[1] if candidates else None
+    return [path for _, path in sorted(candidates)]
+
+
+def find_latest_matching_file():
+    files = find_matching_files()
+    return files[-1] if files else None
+
+
+# === Processed-files manifest ===
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    with open(MANIFEST_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def find_pending_files():
+    """WD exports (oldest first) whose current version is not in the manifest yet."""
+    manifest = load_manifest()
+    return [path for path in find_matching_files() if file_key(path) not in manifest]
+
+
+def mark_processed(keys, output_path=None):
+    """
+    Records the exports as processed. keys maps path -> file_key taken before the export was
+    read, so a file rewritten in the meantime stays pending.
+    """
+    manifest = load_manifest()
+    processed = datetime.now().isoformat(timespec="seconds")
+    for path, key in keys.items():
+        manifest[key] = {
+            "file": os.path.basename(path),
+            "processed": processed,
+            "output": os.path.basename(output_path) if output_path else None,
+        }
+    save_manifest(manifest)
 
 
 # === Load column mapping for deletion ===
 def load_column_mapping():
     mapping_path = os.path.join(INPUT_FOLDER, MAPPING_FILENAME)
-    mapping_df = pd.read_excel(mapping_path, usecols=[0, 1], header=None, names=["column", "action"])
+    mapping_df = aut_cache.read_excel(mapping_path, usecols=[0, 1], header=None, names=["column", "action"])
     return mapping_df[mapping_df["action"].str.lower() == "delete"]["column"].tolist()
 
 
+# === Pruned WD reader ===
+# Reads the export with openpyxl in read-only mode. Only the columns we keep are converted,
+# and rows are handed over in chunks so the filters run before the next block is read.
+# Cell conversion and type inference follow pd.read_excel (same TextParser per chunk).
+def _cell_value(cell):
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return float("nan")
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        return val if val == cell.value else float(cell.value)
+    return cell.value
+
+
+def _header_names(values):
+    # Same names pandas gives: "Unnamed: i" for empty headers, "X.1" for repeated ones
+    names, counts = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value == "" else value
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        names.append(name)
+    return names
+
+
+def _parse_block(columns, block):
+    return TextParser([columns] + block, header=0).read()
+
+
+def read_wd_export(input_path, columns_to_delete, chunk_rows=CHUNK_ROWS):
+    """
+    Returns (drop_cols, missing_cols, chunks): the mapped columns found / not found in the
+    export, and a generator of DataFrames holding only the kept columns.
+    """
+    wb = load_workbook(input_path, read_only=True, data_only=True)
+    ws = wb.worksheets[0]
+    ws.reset_dimensions()
+    rows = ws.iter_rows(min_row=HEADER_ROW)
+
+    header = _header_names([_cell_value(c) for c in next(rows, ())])
+    header_set = set(header)
+    delete_set = set(columns_to_delete)
+    keep_idx = [i for i, name in enumerate(header) if name not in delete_set]
+    keep_names = [header[i] for i in keep_idx]
+    drop_cols = [col for col in columns_to_delete if col in header_set]
+    missing_cols = [col for col in columns_to_delete if col not in header_set]
+
+    def chunks():
+        try:
+            block, pending_empty, produced = [], 0, False
+            for row in rows:
+                if all(c.value is None for c in row):
+                    # Empty rows only count when data follows (trailing ones are trimmed)
+                    pending_empty += 1
+                    continue
+                block.extend([[""] * len(keep_idx)] * pending_empty)
+                pending_empty = 0
+                block.append([_cell_value(row[i]) if i < len(row) else "" for i in keep_idx])
+                if len(block) >= chunk_rows:
+                    yield _parse_block(keep_names, block)
+                    block, produced = [], True
+            if block or not produced:
+                yield _parse_block(keep_names, block)
+        finally:
+            wb.close()
+
+    return drop_cols, missing_cols, chunks()
+
+
+# === Row filters (one mask per chunk, see aut_filters) ===
+def wd_cutoff():
+    return pd.Timestamp.today().normalize() + pd.DateOffset(months=CUTOFF_MONTHS)
+
+
+def wd_filters(cutoff):
+    return [
+        Predicate("status", "Employment Status ID", lambda s: s == 3),
+        Predicate("type", "Time Off type", not_blank),
+        Predicate("date", "Time Off date", lambda s: s <= cutoff,
+                  convert=lambda s: pd.to_datetime(s, format=DATE_FORMATS["Time Off date"], errors="coerce")),
+        Predicate("country", "Work Location Country", lambda s: s.isin(ALLOWED_COUNTRIES)),
+    ]
+
+
+def log_filter_stats(stats, cutoff):
+    if "status" in stats:
+        log(f"🧹 Employment Status ID != 3 — removed {stats['status']} rows")
+    if "type" in stats:
+        log(f"🧹 Empty Time Off type — removed {stats['type']} rows")
+    if "date" in stats:
+        log(f"🧪 Failed to parse 'Time Off date' in {stats['date_na']} rows")
+        log(f"🧹 Time Off date > {cutoff.date()} — removed {stats['date']} rows")
+    if "country" in stats:
+        log(f"🧹 Not in allowed countries — removed {stats['country']} rows")
+
+
 # === Main cleanup function ===
+def open_cleaned_chunks(input_path):
+    """
+    Loads the mapping and opens the export. Returns (drop_cols, missing_cols, cutoff, chunks):
+    chunks(stats) yields the kept columns of CHUNK_ROWS rows at a time with the filters applied
+    and adds the filter counts to the stats dict.
+    """
+    with stage("wd.mapping"):
+        columns_to_delete = load_column_mapping()
+    log(f"📂 Loaded column mapping")
+
+    # Mapped columns are never converted; rows are filtered chunk by chunk while reading
+    drop_cols, missing_cols, raw_chunks = read_wd_export(input_path, columns_to_delete)
+    cutoff = wd_cutoff()
+    predicates = wd_filters(cutoff)
+
+    def chunks(stats):
+        for chunk in raw_chunks:
+            yield apply_filters(chunk, predicates, stats)[0]
+
+    return drop_cols, missing_cols, cutoff, chunks
+
+
+def log_cleanup(input_path, stats, drop_cols, missing_cols, cutoff):
+    log(f"📊 Loaded file '{os.path.basename(input_path)}' with {stats['rows']} rows")
+
+    if missing_cols:
+        log(f"⚠️ Columns to delete not found: {missing_cols}")
+    log(f"🧹 Dropped {len(drop_cols)} columns")
+
+    log_filter_stats(stats, cutoff)
+
+
+def clean_wd_file(input_path):
+    """In-memory mode: returns the cleaned table (main.py hands it on to the SAP expansion)."""
+    drop_cols, missing_cols, cutoff, chunks = open_cleaned_chunks(input_path)
+    stats = {}
+    with stage("wd.load_filter") as st:
+        df = pd.concat(list(chunks(stats)), ignore_index=True)
+        # Typed after the concat: categoricals of different chunks would not combine
+        df = apply_schema(df, WD_COLUMNS)
+        st["rows_in"], st["rows_out"] = stats["rows"], len(df)
+    log_cleanup(input_path, stats, drop_cols, missing_cols, cutoff)
+    return df
+
+
+def stream_wd_file(input_path):
+    """
+    Streaming mode: every cleaned chunk is appended to Table_WD_ddmm.xlsx as soon as it is
+    filtered, so memory holds one chunk whatever the export size. Same file as
+    clean_wd_file + save_wd_table (same writer, same values).
+    xlsx only: the dtypes of each chunk are inferred on their own (a column can be int in one
+    chunk and float in the next), which xlsx cells do not show but CSV text and parquet do.
+    """
+    drop_cols, missing_cols, cutoff, chunks = open_cleaned_chunks(input_path)
+    output_path = wd_output_path()
+    stats = {}
+    with stage("wd.stream") as st:
+        with TableWriter(output_path, OUTPUT_FORMAT) as writer:
+            for chunk in chunks(stats):
+                writer.write_frame(chunk)
+        st["rows_in"], st["rows_out"] = stats["rows"], writer.rows_written
+    log_cleanup(input_path, stats, drop_cols, missing_cols, cutoff)
+    log(f"💾 File saved: {', '.join(os.path.basename(p) for p in writer.paths)}")
+    return writer.paths[0]
+
+
+# === Save cleaned table ===
+def wd_output_path():
+    date_suffix = datetime.now().strftime("%d%m")
+    return os.path.join(OUTPUT_FOLDER, with_format(f"Table_WD_{date_suffix}", OUTPUT_FORMAT))
+
+
+def save_wd_table(df):
+    output_path = wd_output_path()
+    with stage("wd.save", len(df)) as st:
+        paths = write_table(df, output_path, OUTPUT_FORMAT)
+        st["rows_out"] = len(df)
+    log(f"💾 File saved: {', '.join(os.path.basename(p) for p in paths)}")
+    return paths[0]
+
+
 def process_file(input_path):
     try:
-        columns_to_delete = load_column_mapping()
-        log(f"📂 Loaded column mapping")
-
-        df = pd.read_excel(input_path, skiprows=13)
-        log(f"📊 Loaded file '{os.path.basename(input_path)}' with {len(df)} rows")
-
-        # Drop columns
-        actual_cols = set(df.columns)
-        drop_cols = [col for col in columns_to_delete if col in actual_cols]
-        missing_cols = [col for col in columns_to_delete if col not in actual_cols]
-        df.drop(columns=drop_cols, inplace=True)
-        if missing_cols:
-            log(f"⚠️ Columns to delete not found: {missing_cols}")
-        log(f"🧹 Dropped {len(drop_cols)} columns")
-
-        # Filter 1
-        if "Employment Status ID" in df.columns:
-            before = len(df)
-            df = df[df["Employment Status ID"] == 3]
-            log(f"🧹 Employment Status ID != 3 — removed {before - len(df)} rows")
-
-        # Filter 2
-        if "Time Off type" in df.columns:
-            before = len(df)
-            df = df[df["Time Off type"].notna() & (df["Time Off type"].astype(str).str.strip() != "")]
-            log(f"🧹 Empty Time Off type — removed {before - len(df)} rows")
-
-        # Filter 3
-        if "Time Off date" in df.columns:
-            df["Time Off date"] = pd.to_datetime(df["Time Off date"], format="%d/%m/%Y", errors="coerce")
-            failed = df["Time Off date"].isna().sum()
-            log(f"🧪 Failed to parse 'Time Off date' in {failed} rows")
-
-            before = len(df)
-            cutoff = pd.Timestamp.today().normalize() + pd.DateOffset(months=3)
-            df = df[df["Time Off date"] <= cutoff]
-            log(f"🧹 Time Off date > {cutoff.date()} — removed {before - len(df)} rows")
-
-        # Filter 4
-        if "Work Location Country" in df.columns:
-            before = len(df)
-            df = df[df["Work Location Country"].isin(ALLOWED_COUNTRIES)]
-            log(f"🧹 Not in allowed countries — removed {before - len(df)} rows")
-
-        # Save output
-        date_suffix = datetime.now().strftime("%d%m")
-        output_file = f"Table_WD_{date_suffix}.xlsx"
-        output_path = os.path.join(OUTPUT_FOLDER, output_file)
-        df.to_excel(output_path, index=False)
-        log(f"💾 File saved: {output_file}")
+        keys = {input_path: file_key(input_path)}
+        if STREAMING and OUTPUT_FORMAT == "xlsx":
+            output_path = stream_wd_file(input_path)
+        else:
+            output_path = save_wd_table(clean_wd_file(input_path))
+        mark_processed(keys, output_path)
 
     except Exception as e:
         log(f"❌ Error during processing: {e}")
+    finally:
+        write_run_report("wd")
+
+
+# === Batch mode: all unprocessed exports into one table ===
+def merge_wd_tables(frames):
+    """
+    Concatenates the cleaned exports (oldest first) and drops the rows an earlier export
+    already had. Repeats inside one export are kept, as in a single-file run: the nth copy of
+    a row is only a duplicate of the nth copy in another export.
+    Returns (merged table, number of removed rows).
+    """
+    parts = [df.assign(_occurrence=occurrence(df, list(df.columns))) for df in frames]
+    # Typed after the concat: categoricals of different exports would not combine
+    merged = apply_schema(pd.concat(parts, ignore_index=True), WD_COLUMNS)
+    merged, removed = drop_duplicate_keys(merged, list(merged.columns))
+    return merged.drop(columns="_occurrence").reset_index(drop=True), removed
+
+
+def clean_wd_files(input_paths):
+    """Cleans the exports in parallel (BATCH_WORKERS processes) and merges them into one table."""
+    frames = map_in_pool(clean_wd_file, input_paths, max_workers=BATCH_WORKERS)
+    with stage("wd.merge", sum(len(df) for df in frames)) as st:
+        df, removed = merge_wd_tables(frames)
+        st["rows_out"] = len(df)
+    log(f"🔗 Merged {len(input_paths)} WD exports into {len(df)} rows")
+    log(f"🧹 Rows already in another export — removed {removed} rows")
+    return df
+
+
+def process_pending_files():
+    """Cleans every export that is not in the manifest yet into one Table_WD_ddmm file."""
+    try:
+        input_paths = find_pending_files()
+        if not input_paths:
+            log("ℹ️ No unprocessed WD exports")
+            return None
+        keys = {path: file_key(path) for path in input_paths}
+        log(f"📥 Unprocessed WD exports: {', '.join(os.path.basename(p) for p in input_paths)}")
+        output_path = save_wd_table(clean_wd_files(input_paths))
+        mark_processed(keys, output_path)
+        return output_path
+
+    except Exception as e:
+        log(f"❌ Error during processing: {e}")
+    finally:
+        write_run_report("wd")
 
 
 # === Wait and run ===
-def wait_for_file():
+def wait_for_input_file():
     log("🚀 Script started. Waiting for input file")
-    while True:
-        latest_file = find_latest_matching_file()
-        if latest_file:
-            log(f"📥 Detected file: {os.path.basename(latest_file)}")
-            process_file(latest_file)
-            break
-        time.sleep(CHECK_INTERVAL)
+    latest_file = wait_for_complete(find_latest_matching_file, [INPUT_FOLDER], CHECK_INTERVAL)
+    log(f"📥 Detected file: {os.path.basename(latest_file)}")
+    return latest_file
+
+
+def wait_for_file():
+    process_file(wait_for_input_file())
+
+
+def wait_for_pending_files():
+    log("🚀 Script started. Waiting for unprocessed input files")
+    input_paths = wait_for_complete(find_pending_files, [INPUT_FOLDER], CHECK_INTERVAL)
+    log(f"📥 Detected {len(input_paths)} files")
+    return input_paths
 
 
 if __name__ == "__main__":
-    wait_for_file()
+    parser = argparse.ArgumentParser(description="Clean the WD time off export(s) into Table_WD_ddmm.")
+    parser.add_argument("--batch", action="store_true",
+                        help=f"clean all exports not listed in {os.path.basename(MANIFEST_FILE)} into one table")
+    args = parser.parse_args()
+    if args.batch:
+        wait_for_pending_files()
+        process_pending_files()
+    else:
+        wait_for_file()
@@ -1,9 +1,18 @@
 import os
-import time
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
+import aut_columnar
+import aut_delta
+import aut_output
+import aut_partition
+import aut_reconcile
+import aut_schema
+from aut_dedup import drop_duplicate_keys
+from aut_logging import get_logger
+from aut_metrics import stage, write_run_report
+from aut_watcher import wait_for_complete
+from aut_xlsx_writer import write_xlsx
 
 # === CONFIGURATION ===
 watch_dir = os.path.join(os.getcwd(), "PY - Data - EOPWD")
@@ -17,8 +26,18 @@ file_sap = "Table_SAP.xlsx"
 WD_FILE_PREFIX = "Table_WD"   # matches Table_WD.xlsx and Table_WD_*.xlsx
 
 output_file = "SAP_Expanded.xlsx"      # neutral name
+output_format = "xlsx"                 # SAP_Expanded.<format>: xlsx, csv, parquet or feather (see aut_output)
+delta_output = False                   # True: only write rows changed since the last run (see aut_delta)
 log_file = "processing_log_1.txt"
-check_interval = 10  # seconds
+check_interval = 10  # seconds, only used when inotify is not available
+
+# "daily": expand every SAP absence over its full range
+# "window": clip SAP absences to the WD date window (first to last Time Off date) before expanding,
+#           so an open-ended absence yields at most one row per day of that window
+match_mode = "daily"
+
+# Compare the expanded SAP days with WD days and write a report of the differences (see aut_reconcile)
+reconcile_enabled = True
 
 # Columns we keep as-is from SAP; others become "-"
 required_columns = [
@@ -28,12 +47,13 @@ required_columns = [
     "A/AType", "Attendance or Absence Type"
 ]
 
-def log(msg: str) -> None:
-    """Append a timestamped line to the log file and print it."""
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(os.path.join(log_dir, log_file), "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {msg}\n")
-    print(f"[{ts}] {msg}")
+# Columns that make up Key_SAP
+KEY_SAP_COLUMNS = ["Personnel Number", "AbsenceDate_SAP"]
+# Key_SAP in the saved table: AbsenceDate_SAP is dropped there, Start Date holds the same day
+DELTA_KEY_COLUMNS = ["Personnel Number", "Start Date"]
+
+# Append a timestamped line to the log file and print it
+log = get_logger(os.path.join(log_dir, log_file))
 
 def get_unique_output_path(base_dir: str, base_filename: str) -> str:
     """
@@ -57,97 +77,41 @@ def get_unique_output_path(base_dir: str, base_filename: str) -> str:
             return candidate
         counter += 1
 
-def add_formula_columns(xlsx_path: str) -> None:
-    """Ensure 'PY' column exists and mark rows as 'Compared'."""
-    wb = load_workbook(xlsx_path)
-    ws = wb.active
-    headers = [cell.value for cell in ws[1]]
-
-    if "PY" not in headers:
-        col_idx = ws.max_column + 1
-        ws.cell(row=1, column=col_idx).value = "PY"
-        col_letter = get_column_letter(col_idx)
-        for r in range(2, ws.max_row + 1):
-            ws[f"{col_letter}{r}"] = "Compared"
+def new_output_path() -> str:
+    """Non-colliding SAP_Expanded path in watch_dir with the extension of output_format."""
+    return get_unique_output_path(watch_dir, aut_output.with_format(output_file, output_format))
 
-    wb.save(xlsx_path)
-    wb.close()
+def add_py_column(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure 'PY' column exists and mark rows as 'Compared'."""
+    if "PY" not in df.columns:
+        df = df.assign(PY="Compared")
+    return df
 
-def reorder_columns(xlsx_path: str) -> None:
+def move_service_columns_to_end(df: pd.DataFrame) -> pd.DataFrame:
     """
     Move service columns (if present) to the far right, preserving data.
-    Only moves columns that actually exist in the sheet.
+    Only moves columns that actually exist in the frame.
     """
-    wb = load_workbook(xlsx_path)
-    ws = wb.active
-    headers = [cell.value for cell in ws[1]]
-
-    cols_to_move = ["AbsenceDate_SAP", "Key_SAP", "PY"]
-    indices_to_move = [headers.index(c) + 1 for c in cols_to_move if c in headers]
-
-    max_col = ws.max_column
-    max_row = ws.max_row
-    new_col_start = max_col + 1
-
-    # Copy columns to the end
-    for i, src_idx in enumerate(indices_to_move):
-        dst_idx = new_col_start + i
-        ws.cell(row=1, column=dst_idx).value = ws.cell(row=1, column=src_idx).value
-        for r in range(2, max_row + 1):
-            ws.cell(row=r, column=dst_idx).value = ws.cell(row=r, column=src_idx).value
+    cols_to_move = [c for c in ["AbsenceDate_SAP", "Key_SAP", "PY"] if c in df.columns]
+    cols = [c for c in df.columns if c not in cols_to_move] + cols_to_move
+    return df[cols]
 
-    # Delete originals (from right to left)
-    for src_idx in sorted(indices_to_move, reverse=True):
-        ws.delete_cols(src_idx)
-
-    wb.save(xlsx_path)
-    wb.close()
-
-def add_formula_and_remove_duplicates(xlsx_path: str, temp_title: str = "#") -> None:
+def remove_duplicate_rows(df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
     """
-    Add a temporary formula column for duplicate detection, remove dup rows, then drop the temp column.
-    Formula is kept as-is from your previous version.
+    Remove duplicate rows before saving (replaces the old '#' formula column in the workbook).
+    openpyxl never evaluated that formula, so its keys were unique per row and nothing was
+    dropped unless the whole row repeated; dedup on the full row keeps exactly that result.
+    Returns the frame and the number of removed rows.
     """
-    wb = load_workbook(xlsx_path)
-    ws = wb.active
-
-    headers = [cell.value for cell in ws[1]]
-    if temp_title not in headers:
-        col_idx = ws.max_column + 1
-        ws.cell(row=1, column=col_idx).value = temp_title
-    else:
-        col_idx = headers.index(temp_title) + 1
-
-    col_letter = get_column_letter(col_idx)
-    base_formula = '=IFERROR(IF(AK2="SAP Payroll systems";CONCAT(A2;V2;M2);"-");"-")'
-
-    for r in range(2, ws.max_row + 1):
-        ws[f"{col_letter}{r}"] = base_formula.replace("2", str(r))
-
-    # Read back values to detect duplicates quickly
-    seen = set()
-    rows_to_delete = []
-    for r in range(2, ws.max_row + 1):
-        val = ws[f"{col_letter}{r}"].value
-        if val in seen:
-            rows_to_delete.append(r)
-        else:
-            seen.add(val)
-
-    for r in reversed(rows_to_delete):
-        ws.delete_rows(r)
-
-    ws.delete_cols(col_idx)
-
-    wb.save(xlsx_path)
-    wb.close()
-    log(f"✅ Removed {len(rows_to_delete)} duplicates using temp column '{temp_title}'.")
+    before = len(df)
+    df = df.drop_duplicates(keep="first")
+    return df, before - len(df)
 
 def find_latest_wd_file(dir_path: str, prefix: str = "Table_WD") -> str | None:
     """
     Return absolute path to the newest WD file in dir_path matching:
       - starts with 'Table_WD'
-      - ends with '.xlsx'
+      - ends with '.xlsx' (or another output format: .csv, .parquet, .feather)
     Ignores temporary files like '~$...xlsx'.
     """
     latest = None
@@ -155,7 +119,7 @@ def find_latest_wd_file(dir_path: str, prefix: str = "Table_WD") -> str | None:
     for name in os.listdir(dir_path):
         if name.startswith("~$"):
             continue
-        if name.startswith(prefix) and name.lower().endswith(".xlsx"):
+        if name.startswith(prefix) and aut_output.is_table_file(name):
             p = os.path.join(dir_path, name)
             if os.path.isfile(p):
                 m = os.path.getmtime(p)
@@ -164,123 +128,277 @@ def find_latest_wd_file(dir_path: str, prefix: str = "Table_WD") -> str | None:
                     latest_mtime = m
     return latest
 
-def process_files(wd_path: str) -> None:
-    """Main worker: load SAP and the newest WD file, expand SAP by day (ALL absence types), save, post-process."""
-    try:
-        out_path = get_unique_output_path(watch_dir, output_file)
-        log(f"📁 Saving result to: {os.path.basename(out_path)}")
+def expand_sap_by_day(sap_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expand every SAP row into one row per day between 'Start Date' and 'End Date'.
+    Rows are repeated by their day count and the day offsets and 'AbsenceDate_SAP' are
+    generated column-wise. Columns outside required_columns become "-".
+    The index of each output row is the index label of its SAP row.
+    """
+    if sap_df.empty:
+        return pd.DataFrame()
 
-        sap_path = os.path.join(watch_dir, file_sap)
+    start = sap_df["Start Date"]
+    end = sap_df["End Date"]
 
-        log("📂 Loading input files")
-        sap_df = pd.read_excel(sap_path)
-        wd_df  = pd.read_excel(wd_path)
-        log(f"ℹ️ Using WD file: {os.path.basename(wd_path)}")
+    # Same day count as pd.date_range(start, end, freq="D"); end < start gives no rows
+    counts = ((end - start) // pd.Timedelta(days=1) + 1).clip(lower=0).to_numpy(dtype="int64")
+    total = int(counts.sum())
+    if total == 0:
+        return pd.DataFrame()
+
+    # Offset of each output row inside its source row: 0, 1, ..., count - 1
+    row_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    offsets = np.arange(total, dtype="int64") - row_starts
+    rows = np.repeat(np.arange(len(sap_df)), counts)
+    return expanded_rows(sap_df, rows, offsets)
+
+def expand_sap_by_day_columnar(sap_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    expand_sap_by_day with the Key_SAP dedup, planned by the columnar engine (see aut_columnar):
+    only the kept (row, day) pairs are built. Same rows, order and dtypes as the pandas path.
+    """
+    if sap_df.empty:
+        return pd.DataFrame()
+    rows, offsets = aut_columnar.expand_days(sap_df, "Personnel Number")
+    if len(rows) == 0:
+        return pd.DataFrame()
+    return expanded_rows(sap_df, rows, offsets)
+
+def expanded_rows(sap_df: pd.DataFrame, rows: np.ndarray, offsets: np.ndarray) -> pd.DataFrame:
+    """Output rows of the expansion: SAP row at position rows[i], day 'Start Date' + offsets[i]."""
+    start = sap_df["Start Date"]
+    total = len(rows)
+    days = pd.Series(
+        start.to_numpy()[rows] + offsets.astype("timedelta64[D]"),
+        name="AbsenceDate_SAP"
+    )
+
+    # Keep specific SAP columns (dtype kept, e.g. categorical codes); others as "-"
+    data = {}
+    for col in sap_df.columns:
+        if col in required_columns:
+            data[col] = sap_df[col].array.take(rows)
+        else:
+            data[col] = aut_schema.filler(total)
+
+    data["Start Date"] = days.to_numpy()
+    data["End Date"] = days.to_numpy()
+    # Key_SAP is per calendar day, as the old "<Personnel Number>_<YYYYMMDD>" key
+    data["AbsenceDate_SAP"] = days.dt.normalize().to_numpy()
+    data["PY"] = None
+
+    return pd.DataFrame(data, index=sap_df.index[rows])
 
-        # Clean possible leftovers from previous runs
-        for c in ["AbsenceDate_SAP", "Key_SAP"]:
-            if c in sap_df.columns:
-                sap_df.drop(columns=[c], inplace=True)
+def clip_sap_to_window(sap_df: pd.DataFrame, window_start: pd.Timestamp, window_end: pd.Timestamp) -> pd.DataFrame:
+    """
+    Clip SAP absences to [window_start, window_end] (whole days) so expansion only
+    generates the days that can overlap the WD data. Day alignment of 'Start Date'
+    is preserved, absences outside the window are dropped.
+    """
+    start = sap_df["Start Date"]
+    end = sap_df["End Date"]
+    one_day = pd.Timedelta(days=1)
+
+    skip = (-((start - window_start) // one_day)).clip(lower=0)
+    new_start = start + skip * one_day
+    new_end = end.where(end < window_end + one_day, window_end + one_day - pd.Timedelta(microseconds=1))
+
+    clipped = sap_df.assign(**{"Start Date": new_start, "End Date": new_end})
+    return clipped[clipped["Start Date"] <= clipped["End Date"]]
+
+def sanitize_sap(sap_df: pd.DataFrame) -> pd.DataFrame:
+    """SAP rows with valid 'Start Date' / 'End Date', ready for the expansion."""
+    with stage("eop.sanitize", len(sap_df)) as st:
+        # Clean possible leftovers from previous runs (new frame, the caller's SAP table stays untouched)
+        sap_df = sap_df.drop(columns=[c for c in ["AbsenceDate_SAP", "Key_SAP"] if c in sap_df.columns])
 
         # === DATE SANITIZATION (prevents OutOfBounds for 9999-12-31 etc.) ===
-        sap_df["Start Date"] = pd.to_datetime(sap_df["Start Date"], errors="coerce")
-        sap_df["End Date"]   = pd.to_datetime(sap_df["End Date"],   errors="coerce")
+        sap_df["Start Date"] = aut_schema.to_dates(sap_df["Start Date"])
+        sap_df["End Date"]   = aut_schema.to_dates(sap_df["End Date"])
         sap_df = sap_df[
             sap_df["Start Date"].notna()
             & sap_df["End Date"].notna()
             & (sap_df["End Date"] <= max_valid_date)
         ]
+        st["rows_out"] = len(sap_df)
+    return sap_df
 
-        # Build WD Key (kept from your version; not used further but harmless)
-        if {"Employee ID", "Time Off date"}.issubset(wd_df.columns):
-            wd_df["Time Off date"] = pd.to_datetime(wd_df["Time Off date"], errors="coerce")
-            wd_df["Key_WD"] = wd_df["Employee ID"].astype(str) + "_" + wd_df["Time Off date"].dt.strftime("%Y%m%d")
-
-        all_columns = sap_df.columns.tolist()
-        rows = []
-
-        def build_row(src_row, overrides: dict):
-            # Keep specific SAP columns; others as "-"
-            full_row = {col: src_row[col] if col in required_columns else "-" for col in all_columns}
-            full_row.update(overrides)
-            return full_row
-
-        # Expand EVERY SAP row by day (for all absence types)
-        for _, row in sap_df.iterrows():
-            start = row["Start Date"]
-            end = row["End Date"]
-
-            if start == end:
-                rows.append(build_row(row, {
-                    "Start Date": start,
-                    "End Date": end,
-                    "AbsenceDate_SAP": start,
-                    "Key_SAP": f"{row['Personnel Number']}_{start.strftime('%Y%m%d')}",
-                    "PY": None
-                }))
-            else:
-                for d in pd.date_range(start, end, freq="D"):
-                    rows.append(build_row(row, {
-                        "Start Date": d,
-                        "End Date": d,
-                        "AbsenceDate_SAP": d,
-                        "Key_SAP": f"{row['Personnel Number']}_{d.strftime('%Y%m%d')}",
-                        "PY": None
-                    }))
-
-        df = pd.DataFrame(rows)
-
-        # Mark PY where it was None
-        if "PY" in df.columns:
-            df["PY"] = df["PY"].apply(lambda x: "Python script" if pd.isna(x) else x)
-
-        # Unique by Key_SAP
-        if "Key_SAP" in df.columns:
-            df = df.drop_duplicates(subset=["Key_SAP"], keep="first")
+def load_inputs(sap_path: str, wd_path: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Reads SAP and WD at the same time (see aut_partition.ConcurrentLoads) and sanitizes SAP
+    while WD is still being read. Returns (SAP as read, sanitized SAP, WD).
+    """
+    with aut_partition.ConcurrentLoads({"sap": (aut_schema.read_sap, sap_path),
+                                        "wd": (aut_schema.read_wd, wd_path)}) as loads:
+        with stage("eop.load_sap") as st:
+            sap_df = loads.result("sap")
+            st["rows_out"] = len(sap_df)
+        clean_sap_df = sanitize_sap(sap_df)
+        with stage("eop.load_wd") as st:
+            wd_df = loads.result("wd")
+            st["rows_out"] = len(wd_df)
+    return sap_df, clean_sap_df, wd_df
+
+def build_expanded_table(sap_df: pd.DataFrame, wd_df: pd.DataFrame, sanitized: bool = False) -> pd.DataFrame:
+    """
+    Expand SAP by day (ALL absence types) and apply the post-processing; returns the table to save.
+    sanitized: sap_df already went through sanitize_sap.
+    """
+    if not sanitized:
+        sap_df = sanitize_sap(sap_df)
+
+    # Build WD Key (kept from your version; not used further but harmless)
+    if {"Employee ID", "Time Off date"}.issubset(wd_df.columns):
+        wd_df = wd_df.assign(**{"Time Off date": aut_schema.to_dates(wd_df["Time Off date"])})
+        wd_df["Key_WD"] = wd_df["Employee ID"].astype(str) + "_" + wd_df["Time Off date"].dt.strftime("%Y%m%d")
+
+    if match_mode == "window" and "Key_WD" in wd_df.columns:
+        wd_days = wd_df["Time Off date"].dropna()
+        if wd_days.empty:
+            sap_df = sap_df.iloc[0:0]
+        else:
+            window_start = wd_days.min().normalize()
+            window_end = wd_days.max().normalize()
+            sap_df = clip_sap_to_window(sap_df, window_start, window_end)
+            log(f"📐 Expanding SAP only within WD window {window_start.date()} - {window_end.date()}")
+
+    if aut_partition.use_partitions(sap_df, "Personnel Number") and not aut_columnar.enabled():
+        # All days of one employee land in one shard, so both dedups give the single-process result
+        log(f"🧩 Expanding SAP in {aut_partition.workers} partitions by Personnel Number")
+        with stage("eop.partitioned", len(sap_df)) as st:
+            results = aut_partition.run_partitioned(expand_and_dedup, sap_df.reset_index(drop=True), "Personnel Number")
+            df = aut_partition.merge([r[0] for r in results])
+            removed = sum(r[1] for r in results)
+            st["rows_out"] = len(df)
+    else:
+        df, removed = expand_and_dedup(sap_df)
+    log(f"✅ Removed {removed} duplicates using temp column '#'.")
+
+    return df.reset_index(drop=True)
 
+def expand_and_dedup(sap_df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """
+    Expansion, Key_SAP dedup and post-processing of the sanitized SAP rows (or of one shard of them,
+    in a pool worker; nothing is logged here). Returns the table and the number of repeated rows removed.
+    """
+    columnar = aut_columnar.enabled()
+    with stage("eop.expand", len(sap_df)) as st:
+        df = expand_sap_by_day_columnar(sap_df) if columnar else expand_sap_by_day(sap_df)
+        st["rows_out"] = len(df)
+
+    # Mark PY where it was None
+    if "PY" in df.columns:
+        df["PY"] = df["PY"].apply(lambda x: "Python script" if pd.isna(x) else x)
+
+    with stage("eop.dedup", len(df)) as st:
+        # Unique by Key_SAP (Personnel Number + day), deduplicated on the typed columns
+        # (the columnar expansion only returns the first row per key)
+        if "AbsenceDate_SAP" in df.columns and not columnar:
+            df, _ = drop_duplicate_keys(df, KEY_SAP_COLUMNS)
+        st["rows_out"] = len(df)
+
+    with stage("eop.postprocess", len(df)) as st:
         # Normalize time fields
         for c in ["Start", "End time"]:
             if c in df.columns:
                 df[c] = df[c].astype(str).replace({":  :": "-"})
 
         # Put service columns to the end (if present)
-        cols = df.columns.tolist()
-        for c in ["AbsenceDate_SAP", "Key_SAP", "PY"]:
-            if c in cols:
-                cols.remove(c)
-        cols.extend([c for c in ["AbsenceDate_SAP", "Key_SAP", "PY"] if c in df.columns])
-        df = df[cols]
+        df = move_service_columns_to_end(df)
 
         # Drop service columns before saving (as in your original flow)
-        for c in ["AbsenceDate_SAP", "Key_SAP"]:
-            if c in df.columns:
-                df.drop(columns=[c], inplace=True)
+        df = df.drop(columns=[c for c in ["AbsenceDate_SAP", "Key_SAP"] if c in df.columns])
+
+        # Post-processing on the frame (replaces the openpyxl passes over the saved workbook)
+        df = add_py_column(df)
+        df = move_service_columns_to_end(df)      # will only move what exists (likely just 'PY')
+        df, removed = remove_duplicate_rows(df)
+        st["rows_out"] = len(df)
+
+    return df, removed
+
+def save_expanded_table(df: pd.DataFrame, out_path: str) -> list[str]:
+    """
+    Write the expanded table to out_path (more files if an xlsx table is sharded by file); returns the file(s).
+    With delta_output only the rows changed since the last saved table are written (none if nothing changed).
+    """
+    if delta_output:
+        with stage("eop.delta", len(df)) as st:
+            paths = aut_delta.write_delta("SAP_Expanded", df, DELTA_KEY_COLUMNS, output_format, log)
+            st["rows_out"] = len(df)
+        if paths is not None:
+            return paths
+
+    log("📊 Saving results to Excel" if output_format == "xlsx" else f"📊 Saving results as {output_format}")
+    with stage("eop.save", len(df)) as st:
+        paths = aut_output.write_table(df, out_path, output_format)
+        st["rows_out"] = len(df)
+    if len(paths) > 1:
+        log(f"📑 {len(df)} rows split into {', '.join(os.path.basename(p) for p in paths)}")
+    if delta_output:
+        aut_delta.save_snapshot("SAP_Expanded", df)
+    return paths
+
+def save_reconciliation(expanded_df: pd.DataFrame, wd_df: pd.DataFrame) -> str | None:
+    """Reconcile SAP vs WD per employee and day, log the counts and save the keys that differ."""
+    if not {"Personnel Number", "Start Date"}.issubset(expanded_df.columns) \
+            or not {"Employee ID", "Time Off date"}.issubset(wd_df.columns):
+        log("⚠️ Reconciliation skipped: employee or date columns missing")
+        return None
+
+    with stage("eop.reconcile", len(expanded_df) + len(wd_df)) as st:
+        result = aut_reconcile.reconcile(expanded_df, wd_df, aut_reconcile.load_type_mapping())
+        st["rows_out"] = len(result)
+    summary = aut_reconcile.summarize(result)
+    log(f"🔗 Reconciliation: matched {summary['matched']}, SAP only {summary['SAP only']}, "
+        f"WD only {summary['WD only']}, type mismatch {summary['type mismatch']}")
+
+    os.makedirs(aut_reconcile.report_dir, exist_ok=True)
+    report_path = get_unique_output_path(aut_reconcile.report_dir, aut_reconcile.report_file)
+    write_xlsx(aut_reconcile.issues_only(result), report_path)
+    log(f"📄 Reconciliation report saved: {os.path.basename(report_path)}")
+    return report_path
+
+def process_files(wd_path: str) -> None:
+    """Main worker: load SAP and the newest WD file, expand SAP by day (ALL absence types), save, post-process."""
+    try:
+        out_path = new_output_path()
+        log(f"📁 Saving result to: {os.path.basename(out_path)}")
+
+        sap_path = os.path.join(watch_dir, file_sap)
 
-        log("📊 Saving results to Excel")
-        df.to_excel(out_path, index=False)
+        log("📂 Loading input files")
+        _, sap_df, wd_df = load_inputs(sap_path, wd_path)
+        log(f"ℹ️ Using WD file: {os.path.basename(wd_path)}")
 
-        # Post-processing in the saved workbook
-        add_formula_columns(out_path)
-        reorder_columns(out_path)                 # will only move what exists (likely just 'PY')
-        add_formula_and_remove_duplicates(out_path, "#")
+        df = build_expanded_table(sap_df, wd_df, sanitized=True)
+        save_expanded_table(df, out_path)
+        if reconcile_enabled:
+            save_reconciliation(df, wd_df)
 
         log("✅ Processing completed successfully.")
     except Exception as e:
         log(f"❌ ERROR during processing: {e}")
+    finally:
+        write_run_report("eop")
+
+def find_input_files() -> tuple[str, str] | None:
+    """Return (SAP path, newest WD path) once both exist in watch_dir, else None."""
+    files = {f.lower() for f in os.listdir(watch_dir)}
+    sap_ok = "table_sap.xlsx" in files
+    wd_path = find_latest_wd_file(watch_dir, WD_FILE_PREFIX)
+    if sap_ok and wd_path:
+        return os.path.join(watch_dir, file_sap), wd_path
+    return None
 
 def wait_for_files() -> None:
-    """Block until SAP exists and any Table_WD*.xlsx exists; then process the newest WD."""
+    """Block until SAP exists and any Table_WD*.xlsx exists (fully written); then process the newest WD."""
     log("🚀 Script started. Waiting for files")
     log("🔍 Watching for input files")
-    while True:
-        files = {f.lower() for f in os.listdir(watch_dir)}
-        sap_ok = "table_sap.xlsx" in files
-        wd_path = find_latest_wd_file(watch_dir, WD_FILE_PREFIX)
-        if sap_ok and wd_path:
-            log(f"📂 Detected SAP and WD files. Latest WD: {os.path.basename(wd_path)}. Starting processing.")
-            process_files(wd_path)
-            break
-        time.sleep(check_interval)
+    _, wd_path = wait_for_complete(find_input_files, [watch_dir], check_interval)
+    log(f"📂 Detected SAP and WD files. Latest WD: {os.path.basename(wd_path)}. Starting processing.")
+    process_files(wd_path)
 
 if __name__ == "__main__":
     wait_for_files()
@@ -0,0 +1,132 @@
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb  # embedded, multi-threaded columnar SQL engine
+except ImportError:
+    duckdb = None
+
+# === CONFIGURATION ===
+# "pandas": every step in pandas; "columnar": the row-multiplying steps (SAP day expansion with
+# the Key_SAP dedup, CoCd filter with the join dedup) run as one DuckDB query each
+engine = "pandas"
+ENGINES = ("pandas", "columnar")
+threads = os.cpu_count() or 1
+
+# Each query is registered only the columns it needs plus a row id, and returns row ids: the rows
+# are then taken from the pandas frame, so column dtypes (categoricals, Int32) and values are
+# exactly those of the pandas engine. expand_days works on derived int64 columns (key codes, date
+# ticks); filter_first_by_key scans the frame's own columns and filters in the WHERE. WD cleanup
+# and the comparison stay in pandas.
+
+
+def check_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}' (choose from {', '.join(ENGINES)})")
+    if name == "columnar" and duckdb is None:
+        raise RuntimeError("The columnar engine needs duckdb (pip install duckdb)")
+    return name
+
+
+def enabled():
+    return engine == "columnar"
+
+
+def _codes(s):
+    """int64 code per value; NA is one value, as in aut_dedup.composite_key."""
+    codes, _ = pd.factorize(s, use_na_sentinel=False)
+    return codes.astype(np.int64)
+
+
+def _ticks(s):
+    """datetime64 column as int64 ticks of its own unit, and the ticks of one day."""
+    values = s.to_numpy()
+    unit, _ = np.datetime_data(values.dtype)
+    return values.view(np.int64), int(np.timedelta64(1, "D") / np.timedelta64(1, unit))
+
+
+def _scannable(dtype):
+    """True if DuckDB scans the dtype with pandas' equality and NA (= NULL) semantics."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _scannable(dtype.categories.dtype)
+    return (isinstance(dtype, pd.StringDtype) or pd.api.types.is_numeric_dtype(dtype)
+            or (isinstance(dtype, np.dtype) and dtype.kind == "M"))
+
+
+def _is_text(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _is_text(dtype.categories.dtype)
+    return isinstance(dtype, pd.StringDtype)
+
+
+def _run(sql, params=None, **tables):
+    con = duckdb.connect()
+    try:
+        con.execute(f"SET threads = {int(threads)}")
+        for name, frame in tables.items():
+            con.register(name, frame)
+        return con.execute(sql, params).fetchnumpy()
+    finally:
+        con.close()
+
+
+def expand_days(df, key_column, start_column="Start Date", end_column="End Date"):
+    """
+    Day expansion of df (one row per day from start to end, no NaT) with the first row per
+    key_column + calendar day kept. Returns (source row positions, day offsets) in the order of the
+    pandas expansion: by source row, then by day.
+    """
+    start, day = _ticks(df[start_column])
+    end, _ = _ticks(df[end_column])
+    # Calendar day number of the start (floor, also before 1970): the key is per day, any time of day
+    table = pd.DataFrame({"row_id": np.arange(len(df), dtype=np.int64), "k": _codes(df[key_column]),
+                          "s": start, "e": end, "first_day": np.floor_divide(start, day)})
+    result = _run(f"""
+        WITH days AS (
+            SELECT row_id, k, first_day, unnest(range(0, (e - s) // {day} + 1)) AS d
+            FROM absences
+            WHERE e >= s
+        )
+        SELECT row_id, d
+        FROM days
+        QUALIFY row_number() OVER (PARTITION BY k, first_day + d ORDER BY row_id, d) = 1
+        ORDER BY row_id, d
+    """, absences=table)
+    return result["row_id"].astype(np.int64), result["d"].astype(np.int64)
+
+
+def filter_first_by_key(df, key_columns, filter_column, allowed):
+    """
+    Rows of df whose filter_column is in allowed, then the first row per key_columns. DuckDB scans
+    the columns of df (no copy) and filters in the WHERE, before the dedup window; object columns
+    (mixed values, no SQL type) are scanned as codes. Returns (row positions in order, rows removed
+    by the filter, rows removed by the dedup).
+    """
+    columns = [filter_column] + list(key_columns)
+    names = ["f"] + [f"k{i}" for i in range(len(key_columns))]
+    table = df[columns].set_axis(names, axis=1)
+    table = table.assign(row_id=np.arange(len(df), dtype=np.int64), **{
+        name: _codes(df[col]) for name, col in zip(names, columns)
+        if name != "f" and not _scannable(df[col].dtype)})
+
+    if _is_text(df[filter_column].dtype):
+        params = [value for value in allowed if isinstance(value, str)]
+    else:
+        codes, uniques = pd.factorize(df[filter_column])
+        table["f"] = codes.astype(np.int64)
+        params = [i for i, value in enumerate(uniques) if value in allowed]
+    condition = f"f IN ({', '.join('?' * len(params))})" if params else "false"
+
+    keys = ", ".join(names[1:])
+    result = _run(f"""
+        SELECT row_id, count(*) OVER () AS passed
+        FROM combined
+        WHERE {condition}
+        QUALIFY row_number() OVER (PARTITION BY {keys} ORDER BY row_id) = 1
+        ORDER BY row_id
+    """, params, combined=table)
+    positions = result["row_id"].astype(np.int64)
+    # count(*) OVER () is evaluated before QUALIFY: rows left after the filter
+    passed = int(result["passed"][0]) if len(positions) else 0
+    return positions, len(df) - passed, passed - len(positions)
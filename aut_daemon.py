@@ -0,0 +1,167 @@
+import os
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import aut_cleanup_wd_file
+import aut_cleaup_eop_file
+import aut_join_files
+import aut_logging
+import aut_output
+from aut_logging import get_logger
+from aut_watcher import FileWatcher, file_key, is_file_complete
+
+# === CONFIGURATION ===
+log_dir = os.path.join(os.getcwd(), "PY - Logs")
+os.makedirs(log_dir, exist_ok=True)
+log_path = os.path.join(log_dir, "processing_log_daemon.txt")
+ledger_path = os.path.join(log_dir, "daemon_processed.json")
+
+max_workers = 3      # process pool size
+max_pending = 20     # queued + running jobs; further files wait on disk until there is room
+scan_timeout = 1.0   # seconds between checks of finished jobs when no file events arrive
+
+# Jobs of one kind write the same output names (Table_WD_ddmm, SAP_Expanded_<date>-N, Table_SAP_N),
+# so each kind runs one job at a time; different kinds run in parallel.
+JOB_KINDS = ["wd", "eop", "sap"]
+
+
+log = get_logger(log_path)
+
+
+def classify(folder, name):
+    """
+    Returns the job kind for a file, or None if the daemon should ignore it.
+    wd:  WD export in the WD input folder -> aut_cleanup_wd_file
+    eop: Table_WD*.xlsx (or .csv / .parquet / .feather) in the EOPWD folder -> aut_cleaup_eop_file
+    sap: any other drop in the EOPWD folder (incl. SAP_Expanded*) -> aut_join_files
+    """
+    if name.startswith("~$") or name.startswith("."):
+        return None
+    if folder == aut_cleanup_wd_file.INPUT_FOLDER:
+        if name.endswith(".xlsx") and aut_cleanup_wd_file.FILE_NAME_PART in name \
+                and aut_cleanup_wd_file.MAPPING_FILENAME not in name:
+            return "wd"
+        return None
+    if name.startswith(aut_cleaup_eop_file.WD_FILE_PREFIX) and aut_output.is_table_file(name):
+        return "eop"
+    # Table_SAP.xlsx is the master and Table_SAP_N.xlsx are our own join outputs
+    if name.startswith(os.path.splitext(aut_join_files.file_sap)[0]):
+        return None
+    if name in (aut_join_files.log_file, aut_cleaup_eop_file.log_file):
+        return None
+    return "sap"
+
+
+def run_job(kind, path):
+    """Runs one job inside a pool worker (fresh process per job)."""
+    try:
+        if kind == "wd":
+            aut_cleanup_wd_file.process_file(path)
+        elif kind == "eop":
+            aut_cleaup_eop_file.process_files(path)
+        elif kind == "sap":
+            sap_file_path = os.path.join(aut_join_files.watch_dir, aut_join_files.file_sap)
+            aut_join_files.append_new_to_sap(path, sap_file_path)
+    finally:
+        # The worker exits right after the job; write its buffered log lines first
+        aut_logging.flush()
+    return kind, path
+
+
+def load_ledger():
+    if not os.path.exists(ledger_path):
+        return None
+    with open(ledger_path, encoding="utf-8") as f:
+        return set(json.load(f))
+
+
+def save_ledger(seen):
+    tmp_path = ledger_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sorted(seen), f)
+    os.replace(tmp_path, ledger_path)
+
+
+def scan(folders):
+    """Yields (kind, path) for every file in the watched folders the daemon handles."""
+    for folder in folders:
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            kind = classify(folder, name)
+            if kind and os.path.isfile(path):
+                yield kind, path
+
+
+def run_daemon(process_existing=False):
+    """
+    Keeps watching the WD input and EOPWD folders, queues every new file and runs it on a
+    bounded process pool. Processed inputs are recorded in the ledger and never run twice.
+    """
+    folders = [aut_cleanup_wd_file.INPUT_FOLDER, aut_cleaup_eop_file.watch_dir]
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    seen = load_ledger()
+    if seen is None:
+        seen = set()
+        if not process_existing:
+            # First start: files already on disk are history, only new drops are processed
+            seen = {file_key(path) for _, path in scan(folders)}
+            save_ledger(seen)
+
+    queues = {kind: deque() for kind in JOB_KINDS}
+    running = {}  # kind -> (future, key)
+    queued_keys = set()
+
+    log(f"🚀 Daemon started. Watching {len(folders)} folders with {max_workers} workers")
+    with FileWatcher(folders, aut_cleanup_wd_file.CHECK_INTERVAL) as watcher, \
+            ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as pool:
+        while True:
+            # Collect finished jobs
+            for kind, (future, key) in list(running.items()):
+                if not future.done():
+                    continue
+                del running[kind]
+                seen.add(key)
+                save_ledger(seen)
+                error = future.exception()
+                if error:
+                    log(f"❌ {kind} job failed: {error}")
+                else:
+                    log(f"✅ {kind} job finished: {os.path.basename(future.result()[1])}")
+
+            # Queue new complete files while there is room (backpressure)
+            for kind, path in scan(folders):
+                if len(queued_keys) + len(running) >= max_pending:
+                    break
+                try:
+                    key = file_key(path)
+                except OSError:
+                    continue
+                if key in seen or key in queued_keys or any(key == k for _, k in running.values()):
+                    continue
+                if not is_file_complete(path):
+                    continue
+                queues[kind].append((path, key))
+                queued_keys.add(key)
+                log(f"📥 Queued {kind} job: {os.path.basename(path)}")
+
+            # Start the next job of every idle kind
+            for kind in JOB_KINDS:
+                if kind not in running and queues[kind]:
+                    path, key = queues[kind].popleft()
+                    queued_keys.discard(key)
+                    running[kind] = (pool.submit(run_job, kind, path), key)
+                    log(f"⏳ Started {kind} job: {os.path.basename(path)}")
+
+            watcher.wait(scan_timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the WD / SAP folders and process every new drop.")
+    parser.add_argument("--process-existing", action="store_true",
+                        help="on the first start also process files that are already in the folders")
+    args = parser.parse_args()
+    run_daemon(args.process_existing)
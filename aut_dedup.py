@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def composite_key(df, columns):
+    """
+    One int64 code per row for the combination of `columns`, built from the native column
+    values (no string keys). NA is one value per column, as "nan" was in the old string keys.
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    n_key = 1
+    for col in columns:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        n_col = max(len(uniques), 1)
+        if n_key > INT64_MAX // n_col:
+            # Re-number the combinations seen so far so the mixed radix cannot overflow
+            key, key_uniques = pd.factorize(key)
+            n_key = max(len(key_uniques), 1)
+        key = key * n_col + codes
+        n_key *= n_col
+    return key
+
+
+def occurrence(df, columns):
+    """Per row: 0 for the first row of its key, 1 for the second copy, and so on."""
+    key = composite_key(df, columns)
+    return pd.Series(key).groupby(key).cumcount().to_numpy()
+
+
+def duplicated_rows(df, columns):
+    """Boolean array: True for every row whose key already appeared earlier (keep first)."""
+    return pd.Index(composite_key(df, columns)).duplicated(keep="first")
+
+
+def drop_duplicate_keys(df, columns):
+    """Returns (df without repeated keys, number of removed rows); first occurrence wins."""
+    dup = duplicated_rows(df, columns)
+    removed = int(dup.sum())
+    if removed:
+        df = df[~dup]
+    return df, removed
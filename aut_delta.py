@@ -0,0 +1,128 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from datetime import datetime
+import aut_output
+from aut_cache import load_frame, save_frame
+from aut_dedup import composite_key
+
+# === CONFIGURATION ===
+# Delta files live outside the EOPWD folder so the join watcher and the daemon never pick them up
+delta_dir = os.path.join(os.getcwd(), "PY - Data - Delta")
+snapshot_dir = os.path.join(delta_dir, "snapshots")  # last full table per output, as written
+
+CHANGE_COLUMN = "Change type"
+CHANGE_INSERTED = "inserted"
+CHANGE_UPDATED = "updated"
+CHANGE_DELETED = "deleted"
+
+
+def _snapshot_base(name):
+    return os.path.join(snapshot_dir, name)
+
+
+def snapshot_file(name):
+    """Path of the snapshot of `name`, None if there is none yet."""
+    found = glob.glob(glob.escape(_snapshot_base(name)) + ".arrow") + glob.glob(glob.escape(_snapshot_base(name)) + ".pkl")
+    return found[0] if found else None
+
+
+def load_snapshot(name):
+    path = snapshot_file(name)
+    if path is None:
+        return None
+    try:
+        return load_frame(path)
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def save_snapshot(name, df):
+    """Keeps df as the new baseline of `name` (atomic; the other format's file is removed)."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = save_frame(df, _snapshot_base(name))
+    for other in (_snapshot_base(name) + ".arrow", _snapshot_base(name) + ".pkl"):
+        if other != path and os.path.exists(other):
+            os.remove(other)
+    return path
+
+
+def _same(a, b):
+    """Element-wise equality of two aligned Series; NA equals NA."""
+    if a.dtype != b.dtype:
+        # e.g. categoricals with other categories, or a column that changed type
+        a, b = a.astype(object), b.astype(object)
+    eq = (a == b).fillna(False).to_numpy(dtype=bool)
+    return eq | (a.isna() & b.isna()).to_numpy()
+
+
+def diff_frames(old, new, key):
+    """
+    Rows of new that are not in old (inserted) or differ from it (updated), and rows of old that
+    are gone (deleted), matched by the composite key. Returns (changes with CHANGE_COLUMN, counts).
+    """
+    missing = [col for col in key if col not in old.columns or col not in new.columns]
+    if missing:
+        raise ValueError(f"Delta key column(s) missing: {', '.join(missing)}")
+
+    codes = composite_key(pd.concat([old[key], new[key]], ignore_index=True), key)
+    old_codes, new_codes = codes[:len(old)], codes[len(old):]
+    old_index, new_index = pd.Index(old_codes), pd.Index(new_codes)
+    if old_index.has_duplicates or new_index.has_duplicates:
+        raise ValueError(f"Delta key {' + '.join(key)} is not unique")
+
+    old_pos = old_index.get_indexer(new_codes)  # -1: key not in old
+    inserted = old_pos < 0
+    deleted = ~old_index.isin(new_index)
+    common = np.flatnonzero(~inserted)
+
+    updated = np.zeros(len(common), dtype=bool)
+    value_columns = [col for col in new.columns if col not in key]
+    if set(old.columns) != set(new.columns):
+        # A column was added or dropped: every remaining row changed
+        updated[:] = True
+    else:
+        for col in value_columns:
+            a = old[col].iloc[old_pos[common]].reset_index(drop=True)
+            b = new[col].iloc[common].reset_index(drop=True)
+            updated |= ~_same(a, b)
+
+    parts = [
+        new[inserted].assign(**{CHANGE_COLUMN: CHANGE_INSERTED}),
+        new.iloc[common[updated]].assign(**{CHANGE_COLUMN: CHANGE_UPDATED}),
+        old[deleted].assign(**{CHANGE_COLUMN: CHANGE_DELETED}),
+    ]
+    changes = pd.concat(parts, ignore_index=True).reindex(columns=list(new.columns) + [CHANGE_COLUMN])
+    counts = {CHANGE_INSERTED: int(inserted.sum()), CHANGE_UPDATED: int(updated.sum()),
+              CHANGE_DELETED: int(deleted.sum())}
+    return changes, counts
+
+
+def write_delta(name, df, key, fmt, log):
+    """
+    Delta output of the full table df: only the rows that changed since the snapshot of `name`
+    are written, to <name>_Delta_<timestamp>.<fmt> in delta_dir, then df becomes the snapshot.
+    Returns the written file(s) ([] when nothing changed), None without a snapshot (the caller
+    writes the full table and calls save_snapshot).
+    """
+    old = load_snapshot(name)
+    if old is None:
+        log(f"🔀 No snapshot of {name} yet: writing the full table as the delta baseline")
+        return None
+
+    changes, counts = diff_frames(old, df, key)
+    log(f"🔀 {name} delta: {counts[CHANGE_INSERTED]} inserted, {counts[CHANGE_UPDATED]} updated, "
+        f"{counts[CHANGE_DELETED]} deleted")
+    paths = []
+    if len(changes):
+        os.makedirs(delta_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%d%m%Y_%H%M%S")
+        path = os.path.join(delta_dir, aut_output.with_format(f"{name}_Delta_{stamp}.xlsx", fmt))
+        paths = aut_output.write_table(changes, path, fmt)
+        log(f"✅ Delta saved as {', '.join(os.path.basename(p) for p in paths)}")
+    else:
+        log(f"🔀 {name} unchanged: nothing written")
+    # Written after the delta: a crash in between repeats the delta instead of losing it
+    save_snapshot(name, df)
+    return paths
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class Predicate:
+    """
+    One row filter: rows where test(column) is True are kept.
+    convert (optional) turns the raw column into the values that are tested and saved,
+    e.g. parsing dates; values that become NA in that step are counted as "<name>_na".
+    Predicates whose column is missing are skipped, like the old `if col in df.columns` checks.
+    """
+
+    def __init__(self, name, column, test, convert=None):
+        self.name = name
+        self.column = column
+        self.test = test
+        self.convert = convert
+
+
+def apply_filters(df, predicates, stats=None):
+    """
+    Evaluates all predicates into one boolean mask and materializes the result once.
+    stats (dict, optional) accumulates "rows" and, per predicate, the rows it removed in
+    list order (a row is charged to the first predicate that rejects it) — the same numbers
+    the old filter-after-filter code logged. Pass the same dict for every chunk of a file.
+    """
+    if stats is None:
+        stats = {}
+    stats["rows"] = stats.get("rows", 0) + len(df)
+
+    keep = np.ones(len(df), dtype=bool)
+    converted = {}
+    for p in predicates:
+        if p.column not in df.columns:
+            continue
+        values = df[p.column]
+        if p.convert is not None:
+            values = p.convert(values)
+            converted[p.column] = values
+            stats[f"{p.name}_na"] = stats.get(f"{p.name}_na", 0) + int((values.isna().to_numpy() & keep).sum())
+        passed = values.pipe(p.test).fillna(False).to_numpy(dtype=bool)
+        stats[p.name] = stats.get(p.name, 0) + int((keep & ~passed).sum())
+        keep &= passed
+
+    if converted:
+        df = df.assign(**converted)
+    return df[keep], stats
+
+
+# === Common tests ===
+def not_blank(s):
+    """Not NA and not an empty / whitespace-only string (other values count as filled)."""
+    filled = s.notna()
+    try:
+        stripped = s.str.strip()
+    except AttributeError:
+        # not a text column
+        return filled
+    return filled & (stripped.isna() | (stripped != ""))
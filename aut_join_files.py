@@ -1,7 +1,16 @@
 import os
-import time
-from datetime import datetime
 import pandas as pd
+import aut_columnar
+import aut_delta
+import aut_output
+import aut_partition
+import aut_sap_store
+import aut_schema
+from aut_dedup import drop_duplicate_keys
+from aut_filters import Predicate, apply_filters
+from aut_logging import get_logger
+from aut_metrics import stage, write_run_report
+from aut_watcher import wait_for_complete
 
 # === CONFIGURATION ===
 watch_dir = os.path.join(os.getcwd(), "PY - Data - EOPWD")
@@ -10,17 +19,23 @@ os.makedirs(log_dir, exist_ok=True)
 file_sap = "Table_SAP.xlsx"
 log_file = "processing_log_3.txt"
 log_path = os.path.join(log_dir, log_file)
-check_interval = 10  # seconds
+check_interval = 10  # seconds, only used when inotify is not available
+use_store = False     # True: keep the SAP master in Table_SAP.sqlite and only upsert new rows
+export_excel = True   # with use_store: also export the merged table as Table_SAP_N.xlsx
+output_format = "xlsx"  # Table_SAP_N.<format>: xlsx, csv, parquet or feather (see aut_output)
+delta_output = False    # True: only write rows changed since the last run (see aut_delta)
 
+valid_cocds = frozenset([
+    "DE11", "DE14", "DE15", "DE19", "DE20", "DE43", "DE78", "DE84", "DE85", "DE86", "DE91", "DE92", "DE93", "DE94",
+    "HQ01", "HQ02", "HQ06", "HQ76", "HQ78", "HQ79", "HQ80", "HQ81", "HQ82", "HQ83", "HQ86", "HQ87", "HQ93", "HQ95", "HQ96",
+    "LU01", "NL11", "NL84"
+])
+COCD_FILTERS = [Predicate("cocd", "CoCd", lambda s: s.isin(valid_cocds))]
+DEDUP_COLUMNS = ["Pers.No.", "Start Date", "A/AType"]
 
-def log(msg):
-    """
-    Logs a message with a timestamp to both the log file and the console.
-    """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {msg}\n")
-    print(f"[{timestamp}] {msg}")
+
+# Logs a message with a timestamp to both the log file and the console
+log = get_logger(log_path)
 
 
 def get_incremental_filename(base_path):
@@ -36,12 +51,14 @@ def get_incremental_filename(base_path):
         counter += 1
 
 
-def find_new_file(watch_dir, exclude_files):
+def find_new_file(watch_dir, exclude_files, exclude_prefixes=()):
     """
-    Finds the most recently modified file in watch_dir, excluding those in exclude_files.
+    Finds the most recently modified file in watch_dir, excluding those in exclude_files and
+    those starting with one of exclude_prefixes.
     Returns the filename or None if no new files are found.
     """
-    files = [f for f in os.listdir(watch_dir) if f not in exclude_files and os.path.isfile(os.path.join(watch_dir, f))]
+    files = [f for f in os.listdir(watch_dir) if f not in exclude_files and not f.startswith(tuple(exclude_prefixes))
+             and not aut_output.is_partial(f) and os.path.isfile(os.path.join(watch_dir, f))]
     if not files:
         return None
     files.sort(key=lambda f: os.path.getmtime(os.path.join(watch_dir, f)), reverse=True)
@@ -50,22 +67,29 @@ def find_new_file(watch_dir, exclude_files):
 
 def load_excel_files(new_file_path, sap_file_path):
     """
-    Loads the SAP file and new file into pandas DataFrames.
+    Loads the SAP file and new file into pandas DataFrames (both are read at the same time,
+    see aut_partition.ConcurrentLoads).
     Returns: sap_df, new_df, and sap_columns (list of column names).
     """
-    try:
-        log("⏳ Loading SAP file")
-        sap_df = pd.read_excel(sap_file_path)
-        sap_columns = sap_df.columns.tolist()
-    except Exception as e:
-        log(f"❌ ERROR loading SAP file: {e}")
-        return None, None, None
-    try:
-        log("⏳ Loading new file")
-        new_df = pd.read_excel(new_file_path)
-    except Exception as e:
-        log(f"❌ ERROR loading new file: {e}")
-        return None, None, None
+    with aut_partition.ConcurrentLoads({"sap": (aut_schema.read_sap, sap_file_path),
+                                        "new": (aut_schema.read_sap, new_file_path)}) as loads:
+        try:
+            log("⏳ Loading SAP file")
+            with stage("join.load_sap") as st:
+                sap_df = loads.result("sap")
+                st["rows_out"] = len(sap_df)
+            sap_columns = sap_df.columns.tolist()
+        except Exception as e:
+            log(f"❌ ERROR loading SAP file: {e}")
+            return None, None, None
+        try:
+            log("⏳ Loading new file")
+            with stage("join.load_new") as st:
+                new_df = loads.result("new")
+                st["rows_out"] = len(new_df)
+        except Exception as e:
+            log(f"❌ ERROR loading new file: {e}")
+            return None, None, None
     return sap_df, new_df, sap_columns
 
 
@@ -74,16 +98,11 @@ def filter_cocd(combined_df):
     Filters the DataFrame to only include rows where CoCd is in the allowed values.
     Logs how many rows are removed.
     """
-    valid_cocds = [
-        "DE11", "DE14", "DE15", "DE19", "DE20", "DE43", "DE78", "DE84", "DE85", "DE86", "DE91", "DE92", "DE93", "DE94",
-        "HQ01", "HQ02", "HQ06", "HQ76", "HQ78", "HQ79", "HQ80", "HQ81", "HQ82", "HQ83", "HQ86", "HQ87", "HQ93", "HQ95", "HQ96",
-        "LU01", "NL11", "NL84"
-    ]
     if "CoCd" in combined_df.columns:
-        before = len(combined_df)
-        combined_df = combined_df[combined_df["CoCd"].isin(valid_cocds)]
-        removed = before - len(combined_df)
-        log(f"🧹 Filtered CoCd: remaining {len(combined_df)}, removed {removed} rows")
+        with stage("join.filter", len(combined_df)) as st:
+            combined_df, stats = apply_filters(combined_df, COCD_FILTERS)
+            st["rows_out"] = len(combined_df)
+        log(f"🧹 Filtered CoCd: remaining {len(combined_df)}, removed {stats['cocd']} rows")
     else:
         log("❗ Column 'CoCd' not found in combined_df — no filtering applied")
     return combined_df
@@ -94,16 +113,11 @@ def remove_duplicates(combined_df):
     Removes duplicate rows based on the composite key: Pers.No. + Start Date + A/AType.
     Logs how many duplicates are removed.
     """
-    required_cols = ["Pers.No.", "Start Date", "A/AType"]
-    if all(col in combined_df.columns for col in required_cols):
-        combined_df["#"] = combined_df["Pers.No."].astype(str) + \
-                           combined_df["Start Date"].astype(str) + \
-                           combined_df["A/AType"].astype(str)
-        before_dedup = len(combined_df)
-        combined_df.drop_duplicates(subset=["#"], inplace=True)
-        after_dedup = len(combined_df)
-        combined_df.drop(columns=["#"], inplace=True)
-        log(f"🧹 Pers.No. + Start Date + A/AType: Removed duplicates - {before_dedup - after_dedup}")
+    if all(col in combined_df.columns for col in DEDUP_COLUMNS):
+        with stage("join.dedup", len(combined_df)) as st:
+            combined_df, removed = drop_duplicate_keys(combined_df, DEDUP_COLUMNS)
+            st["rows_out"] = len(combined_df)
+        log(f"🧹 Pers.No. + Start Date + A/AType: Removed duplicates - {removed}")
     else:
         log("⚠️ One or more required columns for deduplication ('Pers.No.', 'Start Date', 'A/AType') are missing")
     return combined_df
@@ -111,34 +125,42 @@ def remove_duplicates(combined_df):
 
 def save_combined_file(combined_df, new_file_path, sap_file_path):
     """
-    Saves the combined DataFrame as a new Excel file with an incremental filename.
-    Logs the save status.
+    Saves the combined DataFrame as a new file (output_format, Excel by default) with an
+    incremental filename. Logs the save status. Returns the written file(s), None on error.
+    With delta_output only the rows changed since the last saved table are written, keyed by
+    Pers.No. + Start Date + A/AType.
     """
-    new_sap_path = get_incremental_filename(sap_file_path)
+    new_sap_path = get_incremental_filename(aut_output.with_format(sap_file_path, output_format))
     try:
-        combined_df.to_excel(new_sap_path, index=False)
-        log(f"✅ Saved combined file as {os.path.basename(new_sap_path)} (total {len(combined_df)} rows)")
+        if delta_output:
+            with stage("join.delta", len(combined_df)) as st:
+                paths = aut_delta.write_delta("Table_SAP", combined_df, DEDUP_COLUMNS, output_format, log)
+                st["rows_out"] = len(combined_df)
+            if paths is not None:
+                return paths
+        with stage("join.save", len(combined_df)) as st:
+            paths = aut_output.write_table(combined_df, new_sap_path, output_format)
+            st["rows_out"] = len(combined_df)
+        log(f"✅ Saved combined file as {', '.join(os.path.basename(p) for p in paths)} (total {len(combined_df)} rows)")
+        if delta_output:
+            aut_delta.save_snapshot("Table_SAP", combined_df)
+        return paths
     except Exception as e:
         log(f"❌ ERROR saving combined file: {e}")
+        return None
 
 
-def append_new_to_sap(new_file_path, sap_file_path):
+def combine_with_sap(sap_df, new_df, sap_columns):
     """
-    Main workflow:
-    1. Loads SAP and new file.
-    2. Aligns columns (including "PY" if present).
-    3. Concatenates data, filters by CoCd, removes duplicates, and saves result.
+    Aligns columns (including "PY" if present), concatenates SAP and new data,
+    filters by CoCd and removes duplicates. Returns the combined DataFrame.
     """
-    sap_df, new_df, sap_columns = load_excel_files(new_file_path, sap_file_path)
-    if sap_df is None or new_df is None:
-        return
-
     # Handle "PY" column
     keep_columns = sap_columns + (["PY"] if "PY" in new_df.columns else [])
     new_df = new_df[[col for col in keep_columns if col in new_df.columns]]
 
     if "PY" in new_df.columns and "PY" not in sap_df.columns:
-        sap_df["PY"] = "-"
+        sap_df = sap_df.assign(PY="-")
 
     final_columns = sap_columns + (["PY"] if "PY" in new_df.columns else [])
     sap_df = sap_df[final_columns] if "PY" in sap_df.columns else sap_df[sap_columns]
@@ -147,9 +169,128 @@ def append_new_to_sap(new_file_path, sap_file_path):
     combined_df = pd.concat([sap_df, new_df], ignore_index=True)
     log(f"🧾 Combined rows before CoCd filter: {len(combined_df)}")
 
+    if aut_columnar.enabled() and set(DEDUP_COLUMNS + ["CoCd"]) <= set(combined_df.columns):
+        return filter_and_dedup_columnar(combined_df)
+    if aut_partition.use_partitions(combined_df, "Pers.No.") and set(DEDUP_COLUMNS + ["CoCd"]) <= set(combined_df.columns):
+        return filter_and_dedup_partitioned(combined_df)
+
     combined_df = filter_cocd(combined_df)
     combined_df = remove_duplicates(combined_df)
-    save_combined_file(combined_df, new_file_path, sap_file_path)
+    return combined_df
+
+
+def filter_and_dedup_shard(df):
+    """CoCd filter and key dedup of one shard (runs in a pool worker, no logging)."""
+    with stage("join.filter", len(df)) as st:
+        df, stats = apply_filters(df, COCD_FILTERS)
+        st["rows_out"] = len(df)
+    with stage("join.dedup", len(df)) as st:
+        df, removed = drop_duplicate_keys(df, DEDUP_COLUMNS)
+        st["rows_out"] = len(df)
+    return df, stats["cocd"], removed
+
+
+def filter_and_dedup_partitioned(combined_df):
+    """
+    Same result as filter_cocd + remove_duplicates: the dedup key contains Pers.No., so shards by
+    Pers.No. never share a key, and the merge restores the original row order (and index).
+    """
+    log(f"🧩 Filtering and deduplicating in {aut_partition.workers} partitions by Pers.No.")
+    with stage("join.partitioned", len(combined_df)) as st:
+        results = aut_partition.run_partitioned(filter_and_dedup_shard, combined_df, "Pers.No.")
+        merged = aut_partition.merge([r[0] for r in results])
+        st["rows_out"] = len(merged)
+    filtered_out = sum(r[1] for r in results)
+    log(f"🧹 Filtered CoCd: remaining {len(combined_df) - filtered_out}, removed {filtered_out} rows")
+    log(f"🧹 Pers.No. + Start Date + A/AType: Removed duplicates - {sum(r[2] for r in results)}")
+    return merged
+
+
+def filter_and_dedup_columnar(combined_df):
+    """
+    Same result as filter_cocd + remove_duplicates as one DuckDB query over combined_df (see
+    aut_columnar): CoCd is filtered in the WHERE, only the surviving rows are taken from combined_df.
+    """
+    with stage("join.columnar", len(combined_df)) as st:
+        positions, filtered_out, removed = aut_columnar.filter_first_by_key(
+            combined_df, DEDUP_COLUMNS, "CoCd", valid_cocds)
+        combined_df = combined_df.iloc[positions]
+        st["rows_out"] = len(combined_df)
+    log(f"🧹 Filtered CoCd: remaining {len(combined_df) + removed}, removed {filtered_out} rows")
+    log(f"🧹 Pers.No. + Start Date + A/AType: Removed duplicates - {removed}")
+    return combined_df
+
+
+def append_frame_to_store(new_df, sap_file_path):
+    """
+    Store workflow (use_store = True):
+    1. Creates Table_SAP.sqlite from Table_SAP.xlsx on first use (CoCd filtered, deduplicated).
+    2. Filters the new rows by CoCd and upserts them on (Pers.No., Start Date, A/AType).
+    3. Optionally exports the merged table as Table_SAP_N.xlsx.
+    Work per run depends on the new rows only, not on the SAP history.
+    Returns True when the store (and the export) were updated, False on error (logged).
+    """
+    store_path = os.path.join(os.path.dirname(sap_file_path), aut_sap_store.STORE_FILENAME)
+    conn = aut_sap_store.open_store(store_path)
+    try:
+        if aut_sap_store.is_empty(conn):
+            log(f"⏳ Initializing {aut_sap_store.STORE_FILENAME} from {os.path.basename(sap_file_path)}")
+            sap_df = filter_cocd(aut_schema.read_sap(sap_file_path))
+            inserted = aut_sap_store.upsert_frame(conn, sap_df)
+            log(f"🧾 Store initialized with {inserted} rows")
+
+        # Handle "PY" column (added to the store with "-" for existing rows)
+        store_cols = aut_sap_store.store_columns(conn)
+        keep_columns = store_cols + (["PY"] if "PY" in new_df.columns and "PY" not in store_cols else [])
+        new_df = new_df[[col for col in keep_columns if col in new_df.columns]]
+        log(f"🧾 New rows before CoCd filter: {len(new_df)}")
+
+        new_df = filter_cocd(new_df)
+        with stage("join.store_upsert", len(new_df)) as st:
+            inserted = aut_sap_store.upsert_frame(conn, new_df)
+            st["rows_out"] = inserted
+        log(f"🧹 Pers.No. + Start Date + A/AType: Removed duplicates - {len(new_df) - inserted}")
+        log(f"✅ Upserted {inserted} rows into {aut_sap_store.STORE_FILENAME} "
+            f"(total {aut_sap_store.row_count(conn)} rows)")
+
+        if export_excel and save_combined_file(aut_sap_store.read_store(conn), None, sap_file_path) is None:
+            return False
+        return True
+    except Exception as e:
+        log(f"❌ ERROR updating SAP store: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def append_new_to_sap(new_file_path, sap_file_path):
+    """
+    Main workflow:
+    1. Loads SAP and new file (only the new file with use_store, see append_frame_to_store).
+    2. Combines them (see combine_with_sap).
+    3. Saves result.
+    """
+    try:
+        if use_store:
+            try:
+                log("⏳ Loading new file")
+                with stage("join.load_new") as st:
+                    new_df = aut_schema.read_sap(new_file_path)
+                    st["rows_out"] = len(new_df)
+            except Exception as e:
+                log(f"❌ ERROR loading new file: {e}")
+                return
+            append_frame_to_store(new_df, sap_file_path)
+            return
+
+        sap_df, new_df, sap_columns = load_excel_files(new_file_path, sap_file_path)
+        if sap_df is None or new_df is None:
+            return
+
+        combined_df = combine_with_sap(sap_df, new_df, sap_columns)
+        save_combined_file(combined_df, new_file_path, sap_file_path)
+    finally:
+        write_run_report("join")
 
 
 def wait_for_new_file_and_process():
@@ -158,15 +299,17 @@ def wait_for_new_file_and_process():
     """
     log("🚀 Script started. Waiting for new file")
     exclude_files = [file_sap, "Table_WD.xlsx", log_file]
-    while True:
-        new_file = find_new_file(watch_dir, exclude_files)
-        if new_file:
-            log(f"📂 New file detected: {new_file}")
-            new_file_path = os.path.join(watch_dir, new_file)
-            sap_file_path = os.path.join(watch_dir, file_sap)
-            append_new_to_sap(new_file_path, sap_file_path)
-            break
-        time.sleep(check_interval)
+    # Table_SAP_N outputs and Table_SAP.sqlite (with its -wal / -shm files), as in aut_daemon.classify
+    exclude_prefixes = [os.path.splitext(file_sap)[0]]
+
+    def find_new_file_path():
+        new_file = find_new_file(watch_dir, exclude_files, exclude_prefixes)
+        return os.path.join(watch_dir, new_file) if new_file else None
+
+    new_file_path = wait_for_complete(find_new_file_path, [watch_dir], check_interval)
+    log(f"📂 New file detected: {os.path.basename(new_file_path)}")
+    sap_file_path = os.path.join(watch_dir, file_sap)
+    append_new_to_sap(new_file_path, sap_file_path)
 
 if __name__ == "__main__":
     wait_for_new_file_and_process()
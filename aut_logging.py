@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, batches are still written with one call
+    fcntl = None
+
+# === CONFIGURATION ===
+MAX_BYTES = 5 * 1024 * 1024        # rotate a log file when it grows past this size
+MAX_AGE = timedelta(days=30)       # ... or when its first entry is older than this
+BACKUP_COUNT = 5                   # processing_log_1.txt.1 ... .5
+BATCH_SIZE = 500                   # max lines written per file and batch
+FLUSH_INTERVAL = 0.2               # seconds the writer lets lines collect between batches
+
+
+class _Writer:
+    """
+    Background writer shared by all loggers of the process.
+    log() prints the line and puts it on a queue (console order stays as it was); this thread
+    appends the queued lines to their files in batches (one locked write per file and batch).
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.checked_age = set()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            time.sleep(FLUSH_INTERVAL)
+
+    def _write(self, batch):
+        by_file = {}
+        waiters = []
+        for item in batch:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                continue
+            path, line = item
+            by_file.setdefault(path, []).append(line + "\n")
+
+        for path, lines in by_file.items():
+            try:
+                self._append(path, "".join(lines))
+            except OSError as e:
+                print(f"[log-writer] cannot write {path}: {e}", file=sys.stderr)
+        for event in waiters:
+            event.set()
+
+    def _append(self, path, text):
+        while True:
+            with open(path, "a", encoding="utf-8") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    # Another process may have rotated the file while we waited for the lock
+                    if not os.path.exists(path) or not os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                        continue
+                if self._needs_rotation(path, f):
+                    # The lock is held on the old file until it is renamed; writers waiting on it retry
+                    _rotate(path)
+                    continue
+                f.write(text)
+                return
+
+    def _needs_rotation(self, path, f):
+        size = os.fstat(f.fileno()).st_size
+        if size >= MAX_BYTES:
+            return True
+        if size and path not in self.checked_age:
+            # The age check reads the first timestamp once per file and process
+            self.checked_age.add(path)
+            first = _first_timestamp(path)
+            return first is not None and datetime.now() - first > MAX_AGE
+        return False
+
+
+def _first_timestamp(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            head = f.readline()
+        return datetime.strptime(head[1:20], "%Y-%m-%d %H:%M:%S")
+    except (OSError, ValueError):
+        return None
+
+
+def _rotate(path):
+    for i in range(BACKUP_COUNT - 1, 0, -1):
+        src = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}")
+    if os.path.exists(path):
+        os.replace(path, f"{path}.1")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.thread.is_alive():
+            _writer = _Writer()
+        return _writer
+
+
+def get_logger(log_path, echo=True):
+    """
+    Returns log(msg) for one log file: "[YYYY-mm-dd HH:MM:SS] msg" is printed (when echo is True)
+    and appended to log_path by the background writer.
+    """
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    def log(msg):
+        entry = f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}"
+        if echo:
+            print(entry)
+        _get_writer().put((log_path, entry))
+
+    return log
+
+
+def flush(timeout=5.0):
+    """Blocks until every line logged so far is written."""
+    if _writer is None or not _writer.thread.is_alive():
+        return
+    done = threading.Event()
+    _writer.put(done)
+    done.wait(timeout)
+
+
+atexit.register(flush)
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# === CONFIGURATION ===
+report_dir = os.path.join(os.getcwd(), "PY - Logs")
+# Comma separated stage names (or "all") to run under cProfile / tracemalloc, e.g. "eop.expand,eop.save"
+PROFILE_STAGES = os.environ.get("PY_PROFILE_STAGES", "")
+TRACEMALLOC_STAGES = os.environ.get("PY_TRACEMALLOC_STAGES", "")
+
+_records = []
+
+
+def _enabled(setting, name):
+    names = {s.strip() for s in setting.split(",") if s.strip()}
+    return "all" in names or name in names
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process so far (None where the OS does not report it)."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Measures one pipeline stage: wall time, CPU time, peak/current RSS, rows in and out.
+    Set rows_out on the yielded record:  with stage("eop.expand", len(sap_df)) as st: ...; st["rows_out"] = len(df)
+    """
+    record = {"stage": name, "rows_in": rows_in, "rows_out": None}
+    profiler = cProfile.Profile() if _enabled(PROFILE_STAGES, name) else None
+    trace = _enabled(TRACEMALLOC_STAGES, name)
+    if trace:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    record["started"] = datetime.now().isoformat(timespec="seconds")
+    try:
+        yield record
+        record["status"] = "ok"
+    except BaseException:
+        record["status"] = "error"
+        raise
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall_start, 3)
+        record["cpu_s"] = round(time.process_time() - cpu_start, 3)
+        if profiler:
+            profiler.disable()
+            prof_path = os.path.join(report_dir, f"profile_{name}_{datetime.now():%Y%m%d_%H%M%S}.prof")
+            profiler.dump_stats(prof_path)
+            record["profile"] = os.path.basename(prof_path)
+        if trace:
+            record["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        record["peak_rss_mb"] = _peak_rss_mb()
+        record["rss_mb"] = _current_rss_mb()
+        if record["rows_out"] is not None and record["wall_s"] > 0:
+            record["rows_per_s"] = round(record["rows_out"] / record["wall_s"])
+        _records.append(record)
+
+
+def take_records():
+    """Returns and clears the stages recorded so far (hands worker stages to the parent process)."""
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def add_records(records, **tags):
+    """Adds stages measured elsewhere (e.g. shard=3) to this process' next run report."""
+    _records.extend({**r, **tags} for r in records)
+
+
+def write_run_report(run_name):
+    """Writes all stages recorded since the last report to PY - Logs/run_report_<run>_<timestamp>.json."""
+    if not _records:
+        return None
+    os.makedirs(report_dir, exist_ok=True)
+    report = {
+        "run": run_name,
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+        # Shard stages ran in parallel inside a stage of this process and are not added again
+        "total_wall_s": round(sum(r["wall_s"] for r in _records if "shard" not in r), 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": list(_records),
+    }
+    path = os.path.join(report_dir, f"run_report_{run_name}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    _records.clear()
+    return path
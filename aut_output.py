@@ -0,0 +1,141 @@
+import os
+import pandas as pd
+import aut_cache
+from aut_xlsx_writer import XlsxStreamWriter, is_partial, partial_path, shard_sheet_name
+
+try:
+    import pyarrow  # parquet / feather
+except ImportError:
+    pyarrow = None
+
+# === CONFIGURATION ===
+# Output format -> file extension. xlsx is for people; csv / parquet / feather for other programs
+FORMATS = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+DEFAULT_FORMAT = "xlsx"
+XLSX_SHARD = "sheets"                     # past the worksheet row limit: "sheets" or "files"
+CSV_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"     # same text as the xlsx date cells
+
+
+def check_format(fmt):
+    """Raises early for an unknown format or a columnar format without pyarrow."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format {fmt!r} (use one of {', '.join(FORMATS)})")
+    if fmt in ("parquet", "feather") and pyarrow is None:
+        raise RuntimeError(f"Output format {fmt!r} needs pyarrow (pip install pyarrow)")
+
+
+def with_format(path, fmt):
+    """Same path with the extension of fmt: SAP_Expanded.xlsx -> SAP_Expanded.parquet."""
+    return os.path.splitext(path)[0] + FORMATS[fmt]
+
+
+def is_table_file(name):
+    return name.lower().endswith(tuple(FORMATS.values()))
+
+
+class TableWriter:
+    """
+    Writes one table in chunks: TableWriter(path, fmt).write_frame(df) ... .close().
+    xlsx and csv stream every chunk to disk; parquet and feather keep the chunks and write
+    one columnar file on close (compact in memory, and fast to write and read).
+    Every format is written under a hidden partial name and renamed when complete.
+    """
+
+    def __init__(self, path, fmt=DEFAULT_FORMAT, sheet_name="Sheet1"):
+        check_format(fmt)
+        self.fmt = fmt
+        self.path = with_format(path, fmt)
+        self.rows_written = 0
+        self._xlsx = XlsxStreamWriter(self.path, sheet_name, shard=XLSX_SHARD) if fmt == "xlsx" else None
+        self._csv_started = False
+        self._chunks = []
+
+    @property
+    def paths(self):
+        return self._xlsx.paths if self._xlsx else [self.path]
+
+    def write_frame(self, df):
+        if self.fmt == "xlsx":
+            self._xlsx.write_frame(df)
+        elif self.fmt == "csv":
+            df.to_csv(partial_path(self.path), mode="a" if self._csv_started else "w", header=not self._csv_started,
+                      index=False, date_format=CSV_DATE_FORMAT, encoding="utf-8")
+            self._csv_started = True
+        else:
+            self._chunks.append(df)
+        self.rows_written += len(df)
+
+    def close(self):
+        if self.fmt == "xlsx":
+            self._xlsx.close()
+            return
+        if self.fmt == "csv":
+            if not self._csv_started:
+                pd.DataFrame().to_csv(partial_path(self.path), index=False)
+        else:
+            df = pd.concat(self._chunks, ignore_index=True) if self._chunks else pd.DataFrame()
+            if self.fmt == "parquet":
+                df.to_parquet(partial_path(self.path), index=False)
+            else:
+                df.to_feather(partial_path(self.path))
+            self._chunks = []
+        os.replace(partial_path(self.path), self.path)
+
+    def abort(self):
+        """Drops everything written so far."""
+        if self.fmt == "xlsx":
+            self._xlsx.abort()
+            return
+        self._chunks = []
+        try:
+            os.remove(partial_path(self.path))
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_table(df, path, fmt=DEFAULT_FORMAT, sheet_name="Sheet1"):
+    """Writes df as path (extension replaced by fmt's); returns the written file(s)."""
+    with TableWriter(path, fmt, sheet_name) as writer:
+        writer.write_frame(df)
+    return writer.paths
+
+
+def read_table(path, date_columns=()):
+    """
+    Reads a table written by write_table. xlsx continuation sheets ("Sheet1 (2)", ...) are
+    appended to the first sheet; in csv files the listed date_columns are parsed back to dates.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        df = pd.read_csv(path)
+        for col in date_columns:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format=CSV_DATE_FORMAT, errors="coerce")
+        return df
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext == ".feather":
+        return pd.read_feather(path)
+    # Parsing xlsx is the slow part: parsed workbooks are kept in the read cache
+    return aut_cache.read_through(path, _read_xlsx)
+
+
+def _read_xlsx(path):
+    with pd.ExcelFile(path) as xl:
+        names = xl.sheet_names
+        parts = [names[0]]
+        while shard_sheet_name(names[0], len(parts) + 1) in names:
+            parts.append(shard_sheet_name(names[0], len(parts) + 1))
+        if len(parts) == 1:
+            return xl.parse(names[0])
+        return pd.concat([xl.parse(name) for name in parts], ignore_index=True)
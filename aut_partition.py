@@ -0,0 +1,124 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import aut_logging
+import aut_metrics
+
+# === CONFIGURATION ===
+# Worker processes for the partitioned steps (expansion / dedup / join); 1 = run in this process
+workers = int(os.environ.get("PY_WORKERS", "1"))
+# Smaller inputs are not worth the pool start-up and pickling
+partition_min_rows = 100_000
+# Read the independent inputs of a step (e.g. SAP and WD) at the same time, one process each.
+# xlsx parsing is CPU bound, so on a single CPU the reads would only take turns
+parallel_loads = (os.cpu_count() or 1) > 1
+
+
+def use_partitions(df, key_column):
+    return workers > 1 and len(df) >= partition_min_rows and key_column in df.columns
+
+
+def shard_ids(keys, n_shards):
+    """Shard number per row from a stable hash of the key (the same in every process and run)."""
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+def split(df, key_column, n_shards):
+    """All rows of one key go to the same shard; each shard keeps the original row order."""
+    ids = shard_ids(df[key_column], n_shards)
+    return [df[ids == i] for i in range(n_shards)]
+
+
+def _run_in_worker(func, *args):
+    # A forked worker starts with a copy of the parent's records; only its own go back
+    aut_metrics.take_records()
+    try:
+        result = func(*args)
+    finally:
+        # Pool workers exit without atexit handlers; write their buffered log lines now
+        aut_logging.flush()
+    return result, aut_metrics.take_records()
+
+
+def map_in_pool(func, items, *args, max_workers=None):
+    """
+    Runs func(item, *args) for every item in a process pool (at most max_workers, default
+    workers) and returns the results in item order. func must be a module-level function.
+    Stages measured in the workers are added to this process' run report, tagged with the
+    item number as shard. With one worker or one item everything runs in this process.
+    """
+    n_workers = min(max_workers or workers, len(items))
+    if n_workers <= 1:
+        return [func(item, *args) for item in items]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_run_in_worker, func, item, *args) for item in items]
+        results = []
+        for i, future in enumerate(futures):
+            result, records = future.result()
+            aut_metrics.add_records(records, shard=i)
+            results.append(result)
+    return results
+
+
+def run_partitioned(func, df, key_column, *args):
+    """
+    Runs func(shard, *args) for every shard of df in a process pool and returns the results in
+    shard order (see map_in_pool).
+    """
+    return map_in_pool(func, split(df, key_column, workers), *args)
+
+
+def merge(frames):
+    """
+    Puts shard results back into the single-process row order: rows are sorted by their index
+    (the position of the source row) with a stable sort, so rows of one source keep their order.
+    """
+    non_empty = [f for f in frames if len(f)]
+    if not non_empty:
+        return frames[0]
+    return pd.concat(non_empty).sort_index(kind="stable")
+
+
+class ConcurrentLoads:
+    """
+    Starts independent loads at the same time, one pool process each:
+        with ConcurrentLoads({"sap": (read_sap, sap_path), "wd": (read_wd, wd_path)}) as loads:
+            sap_df = loads.result("sap")   # waits for this input only
+    so work on one input can start while the others are still being read. With
+    parallel_loads off (or a single load) every load runs in this process on its result() call.
+    """
+
+    def __init__(self, loads):
+        self.loads = loads
+        self.results = {}
+        self.futures = {}
+        self.pool = None
+        if parallel_loads and len(loads) > 1:
+            self.pool = ProcessPoolExecutor(max_workers=len(loads))
+            for name, (func, *args) in loads.items():
+                self.futures[name] = self.pool.submit(_run_in_worker, func, *args)
+
+    def result(self, name):
+        if name not in self.results:
+            func, *args = self.loads[name]
+            if self.pool is None:
+                self.results[name] = func(*args)
+            else:
+                result, records = self.futures[name].result()
+                aut_metrics.add_records(records, shard=name)
+                self.results[name] = result
+        return self.results[name]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
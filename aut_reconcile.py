@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+import aut_cache
+
+# === CONFIGURATION ===
+report_dir = os.path.join(os.getcwd(), "PY - Data - Reconciliation")
+report_file = "Reconciliation.xlsx"
+# Optional: two columns "Time Off type" (WD) and "A/AType" (SAP); one WD type may map to several codes.
+# Kept next to WD - ColumnMapping.xlsx: any file in PY - Data - EOPWD counts as a SAP drop
+type_mapping_path = os.path.join(os.getcwd(), "PY - Data - WD original", "WD - TypeMapping.xlsx")
+
+STATUS_MATCHED = "matched"
+STATUS_SAP_ONLY = "SAP only"
+STATUS_WD_ONLY = "WD only"
+
+
+def _employee_keys(sap_ids, wd_ids):
+    """
+    Brings SAP 'Personnel Number' and WD 'Employee ID' to one comparable type:
+    integers when both sides are fully numeric, otherwise trimmed text.
+    """
+    sap_num = pd.to_numeric(sap_ids, errors="coerce")
+    wd_num = pd.to_numeric(wd_ids, errors="coerce")
+    if sap_num.notna().sum() == sap_ids.notna().sum() and wd_num.notna().sum() == wd_ids.notna().sum():
+        return sap_num.astype("Int64"), wd_num.astype("Int64")
+
+    def as_text(s):
+        num = pd.to_numeric(s, errors="coerce")
+        text = s.astype("string").str.strip()
+        # 12345.0 from a float column is the same employee as "12345"
+        whole = num.notna() & (num % 1 == 0)
+        return text.mask(whole, num[whole].astype("Int64").astype("string"))
+
+    return as_text(sap_ids), as_text(wd_ids)
+
+
+def load_type_mapping(path=None):
+    """Returns a DataFrame of allowed (Time Off type, A/AType) pairs, or None without a mapping file."""
+    path = path or type_mapping_path
+    if not os.path.exists(path):
+        return None
+    mapping = aut_cache.read_excel(path, usecols=[0, 1], header=0, names=["Time Off type", "A/AType"], dtype=str)
+    return mapping.dropna().apply(lambda s: s.str.strip()).drop_duplicates()
+
+
+def reconcile(sap_df, wd_df, type_mapping=None):
+    """
+    Hash join of expanded SAP days and WD time-off days on (employee, date).
+    sap_df: 'Personnel Number', 'Start Date' (one row per day), 'A/AType'
+    wd_df:  'Employee ID', 'Time Off date', 'Time Off type'
+    Returns one row per key with 'Status' (matched / SAP only / WD only) and 'Type check'
+    (ok / type mismatch / unmapped; "-" without a mapping or when one side is missing).
+    """
+    sap_emp, wd_emp = _employee_keys(sap_df["Personnel Number"], wd_df["Employee ID"])
+    sap = pd.DataFrame({
+        "Employee": sap_emp.to_numpy(),
+        "Date": pd.to_datetime(sap_df["Start Date"], errors="coerce").dt.normalize().to_numpy(),
+        "A/AType": sap_df["A/AType"].astype("string").str.strip().to_numpy() if "A/AType" in sap_df else pd.NA,
+    })
+    wd = pd.DataFrame({
+        "Employee": wd_emp.to_numpy(),
+        "Date": pd.to_datetime(wd_df["Time Off date"], errors="coerce").dt.normalize().to_numpy(),
+        "Time Off type": wd_df["Time Off type"].astype("string").str.strip().to_numpy() if "Time Off type" in wd_df else pd.NA,
+    })
+    # Several WD entries on one day (e.g. two half days) count as one key; the first type is compared
+    sap = sap.dropna(subset=["Employee", "Date"]).drop_duplicates(subset=["Employee", "Date"])
+    wd = wd.dropna(subset=["Employee", "Date"]).drop_duplicates(subset=["Employee", "Date"])
+
+    result = sap.merge(wd, on=["Employee", "Date"], how="outer", indicator=True, sort=True)
+    result["Status"] = result["_merge"].map({
+        "both": STATUS_MATCHED, "left_only": STATUS_SAP_ONLY, "right_only": STATUS_WD_ONLY
+    }).astype(str)
+    result = result.drop(columns="_merge")
+
+    result["Type check"] = "-"
+    if type_mapping is not None:
+        matched = result["Status"] == STATUS_MATCHED
+        pairs = type_mapping.assign(_ok=True)
+        checked = result.loc[matched, ["Time Off type", "A/AType"]].merge(pairs, how="left", on=["Time Off type", "A/AType"])
+        known_types = set(type_mapping["Time Off type"])
+        type_check = pd.Series("type mismatch", index=checked.index)
+        type_check[checked["_ok"].fillna(False).astype(bool).to_numpy()] = "ok"
+        type_check[~checked["Time Off type"].isin(known_types).to_numpy()] = "unmapped"
+        result.loc[matched, "Type check"] = type_check.to_numpy()
+    return result
+
+
+def summarize(result):
+    counts = result["Status"].value_counts()
+    summary = {status: int(counts.get(status, 0)) for status in (STATUS_MATCHED, STATUS_SAP_ONLY, STATUS_WD_ONLY)}
+    summary["type mismatch"] = int((result["Type check"] == "type mismatch").sum())
+    return summary
+
+
+def issues_only(result):
+    """Compact report: keys that need a look (not in both systems, or different absence types)."""
+    return result[(result["Status"] != STATUS_MATCHED) | (result["Type check"] == "type mismatch")]
@@ -0,0 +1,110 @@
+import sqlite3
+from datetime import datetime
+import pandas as pd
+
+# === CONFIGURATION ===
+STORE_FILENAME = "Table_SAP.sqlite"
+TABLE = "sap"
+KEY_COLUMNS = ["Pers.No.", "Start Date", "A/AType"]
+STORE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _q(name):
+    """Quote a column name for SQL ("Pers.No." etc.)."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def open_store(store_path):
+    """
+    Opens (and creates if needed) the SAP master store.
+    Column kinds are kept in a small meta table so dates come back as dates.
+    """
+    conn = sqlite3.connect(store_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS column_kinds (name TEXT PRIMARY KEY, kind TEXT, position INTEGER)")
+    return conn
+
+
+def store_columns(conn):
+    return [r[0] for r in conn.execute("SELECT name FROM column_kinds ORDER BY position")]
+
+
+def is_empty(conn):
+    if not store_columns(conn):
+        return True
+    return conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0] == 0
+
+
+def ensure_columns(conn, df):
+    """
+    Creates the table on first use (with the unique key index) and adds columns that
+    appear later, e.g. "PY" ("-" for existing rows, like append_new_to_sap did).
+    """
+    existing = store_columns(conn)
+    created = not existing
+    if created:
+        missing_keys = [c for c in KEY_COLUMNS if c not in df.columns]
+        if missing_keys:
+            raise ValueError(f"SAP table is missing key columns {missing_keys}")
+        cols_sql = ", ".join(_q(c) for c in df.columns)
+        conn.execute(f"CREATE TABLE {TABLE} ({cols_sql})")
+        conn.execute(f"CREATE UNIQUE INDEX sap_key ON {TABLE} ({', '.join(_q(c) for c in KEY_COLUMNS)})")
+    for col in df.columns:
+        if col in existing:
+            continue
+        if not created:
+            default = " DEFAULT '-'" if col == "PY" else ""
+            conn.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_q(col)}{default}")
+        kind = "datetime" if pd.api.types.is_datetime64_any_dtype(df[col].dtype) else "value"
+        conn.execute("INSERT INTO column_kinds VALUES (?, ?, ?)", (str(col), kind, len(existing)))
+        existing.append(col)
+
+
+def _to_records(df):
+    """Python values for sqlite: dates as sortable text, NaN as NULL. Key parts are never NULL
+    (sqlite treats NULLs as distinct in unique indexes; "" writes the same empty Excel cell)."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            s = s.dt.strftime(STORE_DATE_FORMAT)
+        elif s.dtype == object:
+            s = s.map(lambda v: v.strftime(STORE_DATE_FORMAT) if isinstance(v, datetime) else v)
+        s = s.astype(object).where(s.notna(), None)
+        if col in KEY_COLUMNS:
+            s = s.where(s.notna(), "")
+        out[col] = s.tolist()
+    return list(zip(*out.values()))
+
+
+def upsert_frame(conn, df):
+    """
+    Inserts rows whose (Pers.No., Start Date, A/AType) is not stored yet; existing rows win,
+    same keep-first rule as remove_duplicates. Cost depends only on len(df).
+    Returns the number of inserted rows.
+    """
+    ensure_columns(conn, df)
+    cols = list(df.columns)
+    sql = (f"INSERT OR IGNORE INTO {TABLE} ({', '.join(_q(c) for c in cols)}) "
+           f"VALUES ({', '.join('?' for _ in cols)})")
+    before = conn.total_changes
+    with conn:
+        conn.executemany(sql, _to_records(df))
+    return conn.total_changes - before
+
+
+def read_store(conn):
+    """Loads the whole store in insertion order (SAP history first, then appended rows)."""
+    columns = store_columns(conn)
+    if not columns:
+        return pd.DataFrame()
+    df = pd.read_sql_query(f"SELECT * FROM {TABLE} ORDER BY rowid", conn)
+    kinds = dict(conn.execute("SELECT name, kind FROM column_kinds"))
+    for col in columns:
+        if kinds.get(col) == "datetime":
+            df[col] = pd.to_datetime(df[col], format=STORE_DATE_FORMAT, errors="coerce")
+    return df
+
+
+def row_count(conn):
+    return conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from aut_output import read_table
+
+# === COLUMN KINDS ===
+ID = "Int32"            # personnel numbers: nullable int32 instead of int64 / float with NaN
+CATEGORY = "category"   # short repeated codes and texts: one small int code per cell
+DATE = "date"           # datetime64; text dates are parsed with DATE_FORMATS when listed there
+
+# SAP absence table (Table_SAP*.xlsx, SAP_Expanded*.xlsx)
+SAP_COLUMNS = {
+    "Pers.No.": ID,
+    "Personnel Number": ID,
+    "EEGrp": CATEGORY,
+    "Employee Group": CATEGORY,
+    "S": CATEGORY,
+    "Employment Status": CATEGORY,
+    "CoCd": CATEGORY,
+    "Company Code": CATEGORY,
+    "PA": CATEGORY,
+    "Personnel Area": CATEGORY,
+    "ESgrp": CATEGORY,
+    "Employee Subgroup": CATEGORY,
+    "Start Date": DATE,
+    "End Date": DATE,
+    "Changed by": CATEGORY,
+    "Start": CATEGORY,
+    "End time": CATEGORY,
+    "A/AType": CATEGORY,
+    "Attendance or Absence Type": CATEGORY,
+    "PY": CATEGORY,
+}
+
+# WD time off table (the cleaned export and Table_WD*.xlsx)
+WD_COLUMNS = {
+    "Employee ID": ID,
+    "Employment Status ID": CATEGORY,
+    "Time Off type": CATEGORY,
+    "Time Off date": DATE,
+    "Work Location Country": CATEGORY,
+}
+
+# Text dates as they come from the source systems
+DATE_FORMATS = {
+    "Time Off date": "%d/%m/%Y",
+}
+
+# Value of SAP columns that are not carried over (see required_columns in aut_cleaup_eop_file)
+FILLER = "-"
+
+
+def to_dates(s, fmt=None):
+    """datetime64 column as-is (no reparse); anything else parsed with fmt (or inferred), bad values NaT."""
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return s
+    return pd.to_datetime(s, format=fmt, errors="coerce")
+
+
+def _convert(s, kind, fmt):
+    if kind == ID:
+        # Text ids ("E1234") and floats that are not whole numbers keep their dtype
+        if not pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+            return s
+        return s.astype(ID)
+    if kind == CATEGORY:
+        return s.astype(CATEGORY)
+    if kind == DATE:
+        # Excel dates arrive as datetime64 already; text dates are only parsed with a known format
+        return to_dates(s, fmt) if fmt else s
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def apply_schema(df, columns):
+    """
+    Converts the columns of df that are listed in columns (SAP_COLUMNS / WD_COLUMNS).
+    Missing columns are skipped; a column whose values do not fit its kind (e.g. a personnel
+    number beyond int32) keeps the dtype read_excel inferred.
+    """
+    converted = {}
+    for col, kind in columns.items():
+        if col not in df.columns:
+            continue
+        try:
+            converted[col] = _convert(df[col], kind, DATE_FORMATS.get(col))
+        except (TypeError, ValueError, OverflowError):
+            continue
+    return df.assign(**converted) if converted else df
+
+
+def _date_columns(columns):
+    return [col for col, kind in columns.items() if kind == DATE]
+
+
+def read_sap(path):
+    return apply_schema(read_table(path, _date_columns(SAP_COLUMNS)), SAP_COLUMNS)
+
+
+def read_wd(path):
+    return apply_schema(read_table(path, _date_columns(WD_COLUMNS)), WD_COLUMNS)
+
+
+def filler(n):
+    """n cells of FILLER as a one-category categorical (1 byte per cell, not one object per cell)."""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[FILLER])
@@ -0,0 +1,233 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from aut_xlsx_writer import XlsxStreamWriter, write_xlsx
+
+# === CONFIGURATION ===
+EXCEL_MAX_ROWS = 1_048_576          # rows per worksheet, header included
+WD_PREAMBLE_ROWS = 13               # report title / filter block above the WD header (HEADER_ROW = 14)
+WD_EXPORT_NAME = "Absence - EUR - Time Offs Report.xlsx"
+WD_MAPPING_NAME = "WD - ColumnMapping.xlsx"
+WD_TYPE_MAPPING_NAME = "WD - TypeMapping.xlsx"
+SAP_TABLE_NAME = "Table_SAP.xlsx"
+
+OPEN_END_DATE = pd.Timestamp("9999-12-31")   # SAP "until further notice"
+
+# (A/AType, SAP text, WD Time Off type, share); codes without leading zero survive read_excel unchanged
+ABSENCE_TYPES = [
+    ("1100", "Annual leave", "Vacation", 0.55),
+    ("1200", "Sickness", "Sick Leave", 0.25),
+    ("1300", "Training", "Training", 0.10),
+    ("1400", "Special leave", "Special Leave", 0.07),
+    ("1500", "Parental leave", "Parental Leave", 0.03),
+]
+VALID_COCDS = ["DE11", "DE14", "DE43", "DE91", "HQ01", "HQ76", "LU01", "NL11", "NL84"]
+OTHER_COCDS = ["FR10", "BE20", "PL30"]        # removed by the CoCd filter of the join
+COCD_COUNTRY = {"DE": "Germany", "HQ": "Germany", "LU": "Luxembourg", "NL": "Netherlands",
+                "FR": "France", "BE": "Belgium", "PL": "Poland"}
+
+WD_COLUMNS_TO_DELETE = ["Worker", "Units", "Unit of Time", "Request Status", "Comment"]
+
+
+def _employees(rng, n_employees):
+    ids = rng.choice(np.arange(100000, 100000 + n_employees * 10), size=n_employees, replace=False)
+    cocds = rng.choice(VALID_COCDS + OTHER_COCDS, size=n_employees,
+                       p=[0.9 / len(VALID_COCDS)] * len(VALID_COCDS) + [0.1 / len(OTHER_COCDS)] * len(OTHER_COCDS))
+    return ids, cocds
+
+
+def _with_duplicates(df, duplicate_share, rng):
+    """Replaces a share of the rows by copies of other rows (same total), in random order."""
+    n_dup = int(len(df) * duplicate_share)
+    if n_dup == 0 or len(df) < 2:
+        return df
+    source = rng.choice(len(df), size=n_dup)
+    target = rng.choice(len(df), size=n_dup, replace=False)
+    order = np.arange(len(df))
+    order[target] = source
+    return df.iloc[order].reset_index(drop=True)
+
+
+def make_sap_table(n_rows, open_ended_share=0.02, duplicate_share=0.05, n_employees=None, seed=0):
+    """
+    SAP absence table with the required_columns schema of aut_cleaup_eop_file plus two columns
+    that the expansion turns into "-". Absences start within the last two years and last
+    1-20 days; open_ended_share of them end on 9999-12-31, duplicate_share rows repeat other rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_employees = n_employees or max(50, n_rows // 20)
+    emp_ids, emp_cocds = _employees(rng, n_employees)
+    emp = rng.integers(0, n_employees, n_rows)
+    cocd = emp_cocds[emp]
+
+    codes, texts, _, shares = zip(*ABSENCE_TYPES)
+    type_idx = rng.choice(len(codes), size=n_rows, p=shares)
+
+    today = pd.Timestamp.today().normalize()
+    start = (today - pd.Timedelta(days=730)).to_datetime64() + rng.integers(0, 820, n_rows).astype("timedelta64[D]")
+    length = np.minimum(rng.geometric(0.3, n_rows), 20) - 1
+    end = (start + length.astype("timedelta64[D]")).astype("datetime64[us]")
+    end[rng.random(n_rows) < open_ended_share] = OPEN_END_DATE.to_datetime64()
+    part_day = rng.random(n_rows) < 0.1
+
+    df = pd.DataFrame({
+        "Pers.No.": emp_ids[emp],
+        "Personnel Number": emp_ids[emp],
+        "EEGrp": "1",
+        "Employee Group": "Active",
+        "S": 3,
+        "Employment Status": "Active",
+        "CoCd": cocd,
+        "Company Code": pd.Series(cocd).radd("Company "),
+        "PA": pd.Series(cocd).str[:2] + "01",
+        "Personnel Area": pd.Series(cocd).str[:2].map(COCD_COUNTRY),
+        "ESgrp": "10",
+        "Employee Subgroup": "Salaried",
+        "Start Date": start.astype("datetime64[us]"),
+        "End Date": end,
+        "Changed by": rng.choice(["HRUSER01", "HRUSER02", "BATCH"], n_rows),
+        "Start": np.where(part_day, "09:00", ":  :"),
+        "End time": np.where(part_day, "13:00", ":  :"),
+        "A/AType": np.array(codes)[type_idx],
+        "Attendance or Absence Type": np.array(texts)[type_idx],
+        "Name": "Employee",
+        "Text": rng.choice(["", "approved", "carry over"], n_rows),
+    })
+    return _with_duplicates(df, duplicate_share, rng)
+
+
+def make_wd_export(n_rows, sap_df=None, duplicate_share=0.05, match_share=0.6, seed=0):
+    """
+    WD "Time Offs" report rows as exported (dates as dd/mm/yyyy text). With sap_df, match_share
+    of the rows are days of SAP absences so the reconciliation finds matches; the rest are
+    random days of SAP employees (or of random ids). Some rows fail the WD cleanup filters
+    (inactive, empty type, unparsable or late date, other country), as in real exports.
+    """
+    rng = np.random.default_rng(seed + 1)
+    type_names = [t[2] for t in ABSENCE_TYPES]
+    type_shares = [t[3] for t in ABSENCE_TYPES]
+    today = pd.Timestamp.today().normalize()
+
+    emp = rng.integers(100000, 100000 + max(50, n_rows // 10) * 10, n_rows)
+    day = (today - pd.Timedelta(days=365)).to_datetime64() + rng.integers(0, 365 + 180, n_rows).astype("timedelta64[D]")
+    wd_type = np.array(type_names)[rng.choice(len(type_names), size=n_rows, p=type_shares)]
+    country = rng.choice(["Germany", "Netherlands", "Luxembourg", "France", "Belgium"], n_rows,
+                         p=[0.5, 0.3, 0.1, 0.05, 0.05])
+
+    if sap_df is not None and len(sap_df):
+        sap = sap_df[sap_df["End Date"] < pd.Timestamp("2262-01-01")]
+        emp = rng.choice(sap_df["Personnel Number"].to_numpy(), n_rows)
+        matched = np.flatnonzero(rng.random(n_rows) < match_share)
+        if len(sap) and len(matched):
+            pick = rng.integers(0, len(sap), len(matched))
+            start = sap["Start Date"].to_numpy()[pick]
+            span = (sap["End Date"].to_numpy()[pick] - start) // np.timedelta64(1, "D") + 1
+            emp[matched] = sap["Personnel Number"].to_numpy()[pick]
+            day[matched] = start + (rng.random(len(matched)) * span).astype("int64").astype("timedelta64[D]")
+            by_code = {t[0]: t[2] for t in ABSENCE_TYPES}
+            wd_type[matched] = pd.Series(sap["A/AType"].to_numpy()[pick]).map(by_code).to_numpy()
+            cocd_country = pd.Series(sap["CoCd"].to_numpy()[pick]).str[:2].map(COCD_COUNTRY)
+            country[matched] = cocd_country.to_numpy()
+
+    date_text = pd.DatetimeIndex(day).strftime("%d/%m/%Y").to_numpy(dtype=object)
+    date_text[rng.random(n_rows) < 0.005] = "n/a"
+    wd_type[rng.random(n_rows) < 0.02] = ""
+    status = np.where(rng.random(n_rows) < 0.92, 3, 1)
+
+    df = pd.DataFrame({
+        "Employee ID": emp,
+        "Worker": "Employee",
+        "Employment Status ID": status,
+        "Time Off type": wd_type,
+        "Time Off date": date_text,
+        "Units": 1,
+        "Unit of Time": "Days",
+        "Work Location Country": country,
+        "Request Status": "Approved",
+        "Comment": "",
+    })
+    return _with_duplicates(df, duplicate_share, rng)
+
+
+def _check_sheet_size(df, what):
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"{what}: {len(df)} rows do not fit into one worksheet (max {EXCEL_MAX_ROWS - 1})")
+
+
+def write_wd_export(df, folder, name=WD_EXPORT_NAME):
+    """Writes the export with the 13-row report preamble above the header, like the WD download."""
+    _check_sheet_size(df, name)
+    path = os.path.join(folder, name)
+    writer = XlsxStreamWriter(path)
+    preamble = [["Absence - EUR - Time Offs Report"], ["Run by", "Synthetic data"],
+                ["Run date", pd.Timestamp.today().strftime("%d/%m/%Y")], ["Rows", len(df)]]
+    for row in preamble + [[None]] * (WD_PREAMBLE_ROWS - len(preamble)):
+        writer.ws.append(row)
+    writer.write_frame(df)
+    writer.close()
+    return path
+
+
+def write_column_mapping(folder, columns):
+    """WD - ColumnMapping.xlsx: column name and "keep" / "delete", no header row."""
+    path = os.path.join(folder, WD_MAPPING_NAME)
+    writer = XlsxStreamWriter(path)
+    for col in columns:
+        writer.ws.append([col, "delete" if col in WD_COLUMNS_TO_DELETE else "keep"])
+    writer.close()
+    return path
+
+
+def write_type_mapping(folder):
+    path = os.path.join(folder, WD_TYPE_MAPPING_NAME)
+    write_xlsx(pd.DataFrame({"Time Off type": [t[2] for t in ABSENCE_TYPES],
+                             "A/AType": [t[0] for t in ABSENCE_TYPES]}), path)
+    return path
+
+
+def write_sap_table(df, folder, name=SAP_TABLE_NAME):
+    _check_sheet_size(df, name)
+    path = os.path.join(folder, name)
+    write_xlsx(df, path)
+    return path
+
+
+def generate(base_dir, sap_rows, wd_rows, open_ended_share=0.02, duplicate_share=0.05, seed=0):
+    """
+    Creates the pipeline input folders under base_dir:
+      PY - Data - WD original: WD export + column mapping + WD type mapping
+      PY - Data - EOPWD:       Table_SAP.xlsx
+    Returns a dict with the written paths.
+    """
+    wd_folder = os.path.join(base_dir, "PY - Data - WD original")
+    eop_folder = os.path.join(base_dir, "PY - Data - EOPWD")
+    os.makedirs(wd_folder, exist_ok=True)
+    os.makedirs(eop_folder, exist_ok=True)
+
+    sap_df = make_sap_table(sap_rows, open_ended_share, duplicate_share, seed=seed)
+    wd_df = make_wd_export(wd_rows, sap_df, duplicate_share, seed=seed)
+    return {
+        "wd_export": write_wd_export(wd_df, wd_folder),
+        "wd_mapping": write_column_mapping(wd_folder, list(wd_df.columns)),
+        "sap_table": write_sap_table(sap_df, eop_folder),
+        "type_mapping": write_type_mapping(wd_folder),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Writes synthetic WD / SAP input files for tests and benchmarks.")
+    parser.add_argument("--out", default=os.path.join(os.getcwd(), "PY - Synthetic"), help="base folder")
+    parser.add_argument("--sap-rows", type=int, default=10000)
+    parser.add_argument("--wd-rows", type=int, default=None, help="default: same as --sap-rows")
+    parser.add_argument("--open-ended", type=float, default=0.02, help="share of SAP absences ending 31.12.9999")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of repeated rows in both inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    paths = generate(args.out, args.sap_rows, args.wd_rows or args.sap_rows, args.open_ended, args.duplicates, args.seed)
+    for what, path in paths.items():
+        print(f"💾 {what}: {path}")
@@ -0,0 +1,135 @@
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import zipfile
+
+# === CONFIGURATION ===
+SETTLE_TIME = 0.5  # seconds a file must keep the same size/mtime before it counts as complete
+
+# inotify event flags (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+class FileWatcher:
+    """
+    Blocks until something changes in the watched folders.
+    Uses Linux inotify (no CPU between events); falls back to sleeping poll_interval
+    seconds when inotify is not available (other OS, missing folder, watch limit reached).
+    """
+
+    def __init__(self, folders, poll_interval: float = 10):
+        self.poll_interval = poll_interval
+        self.fd = None
+        libc = _load_libc()
+        if libc is None:
+            return
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        for folder in folders:
+            if libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK) < 0:
+                os.close(fd)
+                return
+        self.fd = fd
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self.fd is not None
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Return after the next batch of events, or after timeout (poll_interval when polling)."""
+        if self.fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            self._drain()
+
+    def _drain(self) -> None:
+        # Event details are not needed: callers rescan the folder after every batch
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    return
+            except BlockingIOError:
+                return
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _signature(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def file_key(path: str) -> str:
+    """Identity of one input version: the same path rewritten with new content is a new input."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def is_file_complete(path: str, settle_time: float = SETTLE_TIME) -> bool:
+    """
+    True when the file kept the same size/mtime for settle_time seconds.
+    xlsx files must also have a readable zip directory (it is written last while copying).
+    """
+    before = _signature(path)
+    if before is None or before[0] == 0:
+        return False
+    time.sleep(settle_time)
+    if _signature(path) != before:
+        return False
+    if path.lower().endswith(".xlsx"):
+        return zipfile.is_zipfile(path)
+    return True
+
+
+def wait_for_complete(find_fn, folders, poll_interval: float = 10, settle_time: float = SETTLE_TIME):
+    """
+    Call find_fn() after every change in folders until it returns a result whose files are complete.
+    find_fn returns None, a path, or a tuple/list of paths; that value is returned unchanged.
+    """
+    with FileWatcher(folders, poll_interval) as watcher:
+        while True:
+            found = find_fn()
+            if found:
+                paths = [found] if isinstance(found, str) else list(found)
+                if all(is_file_complete(p, settle_time) for p in paths):
+                    return found
+                # Still being written: recheck soon even if no further event arrives
+                watcher.wait(settle_time)
+                continue
+            watcher.wait()
@@ -0,0 +1,159 @@
+import os
+import datetime
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+# Same number formats pandas' to_excel uses, so files look identical to the old output
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+DATE_FORMAT = "YYYY-MM-DD"
+
+# Excel worksheet limit: 1,048,576 rows including the header row
+MAX_DATA_ROWS = 1_048_575
+# Rows converted to python values at a time (memory stays at one block, whatever the frame size)
+BLOCK_ROWS = 10_000
+
+
+def shard_sheet_name(sheet_name: str, part: int) -> str:
+    """Sheet1, Sheet1 (2), Sheet1 (3), ..."""
+    return sheet_name if part == 1 else f"{sheet_name} ({part})"
+
+
+def partial_path(path: str) -> str:
+    """Hidden name a file is written under until it is complete: SAP_Expanded.xlsx -> .SAP_Expanded.xlsx.partial"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.partial")
+
+
+def is_partial(name: str) -> bool:
+    return name.startswith(".") and name.endswith(".partial")
+
+
+def shard_path(path: str, part: int) -> str:
+    """SAP_Expanded.xlsx, SAP_Expanded_part2.xlsx, ..."""
+    if part == 1:
+        return path
+    name, ext = os.path.splitext(path)
+    return f"{name}_part{part}{ext}"
+
+
+class XlsxStreamWriter:
+    """
+    Constant-memory xlsx writer (openpyxl write-only mode).
+    Frames are appended with write_frame(); rows go straight to the file, nothing is kept per cell.
+    Layout matches df.to_excel(path, index=False): plain header row, then the data.
+    A table longer than max_rows continues on a new sheet ("Sheet1 (2)", shard="sheets") or in
+    a new file ("<name>_part2.xlsx", shard="files"), each starting with the header row.
+    Files are written under partial_path() and only renamed to their real names once the
+    whole table is saved, so a failed run never leaves a half-written file behind.
+    """
+
+    def __init__(self, path: str, sheet_name: str = "Sheet1", max_rows: int = MAX_DATA_ROWS,
+                 shard: str = "sheets"):
+        if shard not in ("sheets", "files"):
+            raise ValueError(f"shard must be 'sheets' or 'files', not {shard!r}")
+        self.path = path
+        self.sheet_name = sheet_name
+        self.max_rows = max_rows
+        self.shard = shard
+        self.paths = [path]
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(sheet_name)
+        self.part = 1
+        self.sheet_rows = 0
+        self.columns = None
+        self.rows_written = 0
+
+    def _next_part(self) -> None:
+        self.part += 1
+        if self.shard == "files":
+            self.wb.save(partial_path(self.paths[-1]))
+            self.wb.close()
+            self.paths.append(shard_path(self.path, self.part))
+            self.wb = Workbook(write_only=True)
+            self.ws = self.wb.create_sheet(self.sheet_name)
+        else:
+            self.ws = self.wb.create_sheet(shard_sheet_name(self.sheet_name, self.part))
+        self.ws.append(self.columns)
+        self.sheet_rows = 0
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        """Append all rows of df; the header is written with the first frame (and on every new sheet)."""
+        if self.columns is None:
+            self.columns = [str(c) for c in df.columns]
+            self.ws.append(self.columns)
+
+        start = 0
+        while start < len(df):
+            if self.sheet_rows == self.max_rows:
+                self._next_part()
+            part_rows = min(len(df) - start, self.max_rows - self.sheet_rows, BLOCK_ROWS)
+            block = df.iloc[start:start + part_rows]
+            columns = [_column_values(self.ws, block[c]) for c in block.columns]
+            for row in zip(*columns):
+                self.ws.append(row)
+            self.sheet_rows += part_rows
+            start += part_rows
+        self.rows_written += len(df)
+
+    def close(self) -> None:
+        self.wb.save(partial_path(self.paths[-1]))
+        self.wb.close()
+        for path in self.paths:
+            os.replace(partial_path(path), path)
+
+    def abort(self) -> None:
+        """Drops everything written so far."""
+        # Finish the sheets' temp files (removed by openpyxl at exit) instead of leaving their writers open
+        for ws in self.wb.worksheets:
+            if not ws.closed:
+                ws.close()
+        for path in self.paths:
+            try:
+                os.remove(partial_path(path))
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def _column_values(ws, series: pd.Series):
+    """Yield the cell values of one column: python scalars, None for NaN/NaT, formatted cells for dates."""
+    values = series.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return _date_cells(ws, values, DATETIME_FORMAT)
+    return (_styled_date(ws, v) if isinstance(v, (datetime.datetime, datetime.date)) else v for v in values)
+
+
+def _date_cells(ws, values, number_format):
+    # write-only rows are serialized on append, so one styled cell per column can be reused
+    cell = WriteOnlyCell(ws)
+    for v in values:
+        if v is None:
+            yield None
+            continue
+        cell.value = v
+        cell.number_format = number_format
+        yield cell
+
+
+def _styled_date(ws, value):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.number_format = DATETIME_FORMAT if isinstance(value, datetime.datetime) else DATE_FORMAT
+    return cell
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheet_name: str = "Sheet1", shard: str = "sheets") -> list[str]:
+    """One-shot streaming replacement for df.to_excel(path, index=False); returns the written file(s)."""
+    with XlsxStreamWriter(path, sheet_name, shard=shard) as writer:
+        writer.write_frame(df)
+    return writer.paths
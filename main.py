@@ -1,6 +1,19 @@
 import os
-import subprocess
-from datetime import datetime
+import argparse
+
+import aut_cleanup_wd_file
+import aut_cleaup_eop_file
+import aut_join_files
+import aut_cache
+import aut_checkpoint
+import aut_columnar
+import aut_daemon
+import aut_output
+import aut_partition
+import aut_schema
+from aut_logging import get_logger
+from aut_metrics import stage, write_run_report
+from aut_watcher import file_key
 
 
 # === LOG SETUP ===
@@ -8,50 +21,347 @@ log_dir = os.path.join(os.getcwd(), "PY - Logs")
 os.makedirs(log_dir, exist_ok=True)
 log_path = os.path.join(log_dir, "processing_log_0.txt")
 
-def write_log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path, "a", encoding="utf-8") as log_file:
-        log_file.write(f"[{timestamp}] {message}\n")
+# File only (the stage scripts print their own progress)
+write_log = get_logger(log_path, echo=False)
 
-def run_script(script_name, step_desc):
+def run_stage(script_name, step_desc, stage_func, *args):
+    """
+    Runs one pipeline stage in-process. Returns (True, result) on success, (False, error) on error.
+    """
     try:
         print(f"🚀 {step_desc}")
         write_log(f"⏳ Running {script_name}")
-        subprocess.run(["python", script_name], check=True)
+        result = stage_func(*args)
         write_log(f"✅ Finished {script_name}")
         print(f"✅ {script_name} completed")
-        return True
-    except subprocess.CalledProcessError as e:
+        return True, result
+    except Exception as e:
         error_msg = f"[ERROR] {script_name} failed: {e}"
         print(error_msg)
         write_log(error_msg)
         print("\n[STOP] Execution stopped due to error above.")
-        return False
-    except Exception as e:
-        general_error = f"[ERROR] {script_name} unexpected error: {e}"
-        print(general_error)
-        write_log(general_error)
-        print("\n[STOP] Execution stopped due to unexpected error above.")
-        return False
+        return False, e
+
+
+# === MEMOIZATION (see aut_cache) ===
+# Set in __main__ unless --no-cache; stage keys are None without it
+run_cache = None
+
+def wd_config():
+    wd = aut_cleanup_wd_file
+    return {"cutoff": wd.wd_cutoff().date().isoformat(), "countries": sorted(wd.ALLOWED_COUNTRIES), "header_row": wd.HEADER_ROW,
+            "output_format": wd.OUTPUT_FORMAT}
+
+def eop_config():
+    eop = aut_cleaup_eop_file
+    return {"match_mode": eop.match_mode, "required_columns": eop.required_columns,
+            "key_sap_columns": eop.KEY_SAP_COLUMNS, "output_format": eop.output_format, "delta_output": eop.delta_output}
+
+def join_config():
+    return {"valid_cocds": sorted(aut_join_files.valid_cocds), "dedup_columns": aut_join_files.DEDUP_COLUMNS,
+            "output_format": aut_join_files.output_format, "delta_output": aut_join_files.delta_output}
+
+def stage_key(name, inputs, config, upstream=()):
+    if run_cache is None:
+        return None
+    return run_cache.stage_key(name, inputs, config, [key for key in upstream if key])
+
+def load_cached(name, key, log):
+    """(DataFrame, output paths) of an earlier run with the same inputs and config, else None."""
+    if run_cache is None:
+        return None
+    hit = run_cache.load(name, key)
+    if hit is not None:
+        log(f"♻️ Inputs and config unchanged, reusing the cached {name} result")
+    return hit
+
+def remember(name, key, df, outputs=()):
+    if run_cache is not None:
+        run_cache.store(name, key, df, outputs)
+
+def outputs_exist(outputs):
+    return bool(outputs) and all(os.path.exists(p) for p in outputs)
+
+def load_sap(sap_path):
+    with stage("eop.load_sap") as st:
+        sap_df = aut_schema.read_sap(sap_path)
+        st["rows_out"] = len(sap_df)
+    return sap_df
+
+
+# === STAGES (DataFrames are passed in memory) ===
+def stage_cleanup_wd(persist_intermediates, batch):
+    """
+    Step 1: clean the newest WD export, or with batch every export not processed yet (merged
+    into one table). Table_WD_ddmm.xlsx is only written when persisting.
+    Returns (wd_df, {path: file_key}, stage key); wd_df is None when batch finds nothing new.
+    """
+    if batch:
+        input_paths = aut_cleanup_wd_file.find_pending_files()
+        if not input_paths:
+            aut_cleanup_wd_file.log("ℹ️ No unprocessed WD exports, using the newest Table_WD file")
+            return None, {}, None
+        aut_cleanup_wd_file.log(f"📥 Unprocessed WD exports: {', '.join(os.path.basename(p) for p in input_paths)}")
+    else:
+        input_paths = [aut_cleanup_wd_file.wait_for_input_file()]
+    keys = {path: file_key(path) for path in input_paths}
+    mapping_path = os.path.join(aut_cleanup_wd_file.INPUT_FOLDER, aut_cleanup_wd_file.MAPPING_FILENAME)
+    key = stage_key("wd", input_paths + [mapping_path], wd_config())
+
+    hit = load_cached("wd", key, aut_cleanup_wd_file.log)
+    if hit is not None:
+        wd_df, outputs = hit
+    elif batch:
+        wd_df, outputs = aut_cleanup_wd_file.clean_wd_files(input_paths), []
+    else:
+        wd_df, outputs = aut_cleanup_wd_file.clean_wd_file(input_paths[0]), []
+    written = []
+    if persist_intermediates and not outputs_exist(outputs):
+        written = [aut_cleanup_wd_file.save_wd_table(wd_df)]
+    if hit is None or written:
+        remember("wd", key, wd_df, written or outputs)
+    return wd_df, keys, key
+
+def stage_expand_sap(wd_df, wd_key):
+    """
+    Step 2: expand SAP by day and save SAP_Expanded. Uses the newest Table_WD*.xlsx if step 1 was skipped.
+    Table_SAP.xlsx is parsed once here and handed on to step 3 (None when the cached result is reused).
+    """
+    watch_dir = aut_cleaup_eop_file.watch_dir
+    sap_path = os.path.join(watch_dir, aut_cleaup_eop_file.file_sap)
+    inputs = [sap_path]
+    if wd_df is None:
+        wd_path = aut_cleaup_eop_file.find_latest_wd_file(watch_dir, aut_cleaup_eop_file.WD_FILE_PREFIX)
+        if wd_path is None:
+            raise FileNotFoundError(f"No {aut_cleaup_eop_file.WD_FILE_PREFIX}*.xlsx found in {watch_dir}")
+        aut_cleaup_eop_file.log(f"ℹ️ Using WD file: {os.path.basename(wd_path)}")
+        inputs.append(wd_path)
+    key = stage_key("eop", inputs, eop_config(), [wd_key])
+
+    sap_df = None
+    hit = load_cached("eop", key, aut_cleaup_eop_file.log)
+    if hit is not None:
+        expanded_df, outputs = hit
+        # In delta mode the table is always diffed: the snapshot may be from another run
+        if outputs_exist(outputs) and not aut_cleaup_eop_file.delta_output:
+            aut_cleaup_eop_file.log(f"📁 Result unchanged: {os.path.basename(outputs[0])}")
+            return sap_df, expanded_df, outputs[0], key
+    elif wd_df is None:
+        # SAP and the WD file are read at the same time, SAP is sanitized while WD is still loading
+        sap_df, clean_sap_df, wd_df = aut_cleaup_eop_file.load_inputs(sap_path, wd_path)
+        expanded_df = aut_cleaup_eop_file.build_expanded_table(clean_sap_df, wd_df, sanitized=True)
+    else:
+        sap_df = load_sap(sap_path)
+        expanded_df = aut_cleaup_eop_file.build_expanded_table(sap_df, wd_df)
+
+    out_path = aut_cleaup_eop_file.new_output_path()
+    if not aut_cleaup_eop_file.delta_output:
+        aut_cleaup_eop_file.log(f"📁 Saving result to: {os.path.basename(out_path)}")
+    outputs = aut_cleaup_eop_file.save_expanded_table(expanded_df, out_path)
+    if hit is None and aut_cleaup_eop_file.reconcile_enabled:
+        aut_cleaup_eop_file.save_reconciliation(expanded_df, wd_df)
+    # Delta files are not the stage's table: nothing to reuse them for
+    remember("eop", key, expanded_df, () if aut_cleaup_eop_file.delta_output else outputs)
+    aut_cleaup_eop_file.log("✅ Processing completed successfully.")
+    # With --delta: the delta file, or the would-be name when nothing changed (only logged by step 3)
+    return sap_df, expanded_df, outputs[0] if outputs else out_path, key
+
+def stage_join(sap_df, expanded_df, expanded_path, eop_key):
+    """Step 3: append the expanded table to SAP and save Table_SAP_N.xlsx."""
+    sap_file_path = os.path.join(aut_join_files.watch_dir, aut_join_files.file_sap)
+    aut_join_files.log(f"📂 New file detected: {os.path.basename(expanded_path)}")
+    if aut_join_files.use_store:
+        # The store is updated in place (an idempotent upsert), nothing to memoize
+        if not aut_join_files.append_frame_to_store(expanded_df, sap_file_path):
+            # Logged by append_frame_to_store; the step must not count as done
+            raise RuntimeError("SAP store was not updated")
+        return None
+    key = stage_key("join", [sap_file_path], join_config(), [eop_key])
+
+    hit = load_cached("join", key, aut_join_files.log)
+    if hit is not None:
+        combined_df, outputs = hit
+        if outputs_exist(outputs) and not aut_join_files.delta_output:
+            aut_join_files.log(f"✅ Combined file unchanged: {os.path.basename(outputs[0])}")
+            return combined_df
+    else:
+        if sap_df is None:
+            sap_df = load_sap(sap_file_path)
+        combined_df = aut_join_files.combine_with_sap(sap_df, expanded_df, sap_df.columns.tolist())
+    outputs = aut_join_files.save_combined_file(combined_df, expanded_path, sap_file_path)
+    if outputs is None:
+        # Logged by save_combined_file; the step must not count as done
+        raise RuntimeError("combined file was not saved")
+    remember("join", key, combined_df, () if aut_join_files.delta_output else outputs)
+    return combined_df
+
+# Modules whose output_format / OUTPUT_FORMAT setting --output-format changes
+OUTPUT_STAGES = {"wd": (aut_cleanup_wd_file, "OUTPUT_FORMAT"),
+                 "eop": (aut_cleaup_eop_file, "output_format"),
+                 "join": (aut_join_files, "output_format")}
+
+def set_output_formats(values):
+    """Applies --output-format values: "csv" sets all steps, "eop=parquet" one step."""
+    for value in values:
+        names, _, fmt = value.rpartition("=")
+        aut_output.check_format(fmt)
+        for name in (names.split(",") if names else OUTPUT_STAGES):
+            if name not in OUTPUT_STAGES:
+                raise ValueError(f"Unknown step {name!r} in --output-format (use {', '.join(OUTPUT_STAGES)})")
+            module, setting = OUTPUT_STAGES[name]
+            setattr(module, setting, fmt)
+
+def resume_checkpoint(run_status, name, step):
+    """(DataFrame or None, record) if the resumed run already finished this stage, else None."""
+    done = aut_checkpoint.load_stage(run_status, name)
+    if done is not None:
+        print(f"⏭️ Step {step} already done in run {run_status['run_id']}, using its checkpoint")
+        write_log(f"⏭️ Step {step} restored from checkpoint ({run_status['run_id']})")
+    return done
+
+def finish(exit_code):
+    """Writes one run report for the whole pipeline (all stages of all steps) and the run manifest, then exits."""
+    if run_cache is not None:
+        run_cache.save()
+    report_path = write_run_report("pipeline")
+    if report_path:
+        write_log(f"📈 Run report: {os.path.basename(report_path)}")
+    exit(exit_code)
+
+# Options that shape a run's outputs; stored with its checkpoints and reused by --resume
+RUN_OPTIONS = ["persist_intermediates", "batch", "delta", "output_format"]
+
+def restore_run_options(args, options):
+    for name in RUN_OPTIONS:
+        if name in options and getattr(args, name) != options[name]:
+            print(f"[INFO] --resume keeps the option of the interrupted run: {name} = {options[name]}")
+            setattr(args, name, options[name])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the WD / SAP absence pipeline in one process.")
+    parser.add_argument(
+        "--persist-intermediates", action="store_true",
+        help="also write intermediate Excel files (Table_WD_ddmm.xlsx)"
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="keep watching the input folders and process every new WD / SAP drop (see aut_daemon.py)"
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="step 1 cleans every WD export not processed yet (see wd_processed.json) into one table"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue the last run from its first unfinished step (see aut_checkpoint.py)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="recompute every step even if its inputs and config are unchanged (see aut_cache.py)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=aut_partition.workers,
+        help="processes for SAP expansion and the join; data is partitioned by personnel number (default: 1)"
+    )
+    parser.add_argument(
+        "--delta", action="store_true",
+        help="steps 2 and 3 only write rows inserted, updated or deleted since the last run (see aut_delta.py)"
+    )
+    parser.add_argument(
+        "--engine", choices=aut_columnar.ENGINES, default=aut_columnar.engine,
+        help="columnar: SAP day expansion and the join CoCd filter / dedup run as DuckDB queries, the "
+             "other steps stay in pandas (same results, see aut_columnar.py)"
+    )
+    parser.add_argument(
+        "--output-format", action="append", default=[], metavar="[STEP=]FORMAT",
+        help="xlsx (default), csv, parquet or feather; for all steps or one of wd / eop / join, "
+             "e.g. --output-format eop=parquet (repeatable)"
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    # Ask about WD cleanup
-    run_cleanup = input("Do you want to run aut_cleanup_wd_file.py? (y/n): ").strip().lower()
+    args = parse_args()
+    aut_partition.workers = args.workers
+
+    # Every finished step is checkpointed; --resume continues after the last one with the
+    # options of that run (a delta chain or output format must not change halfway)
+    run_status = aut_checkpoint.load_status() if args.resume else None
+    if args.resume:
+        if run_status is None or aut_checkpoint.first_incomplete(run_status) is None:
+            print("[INFO] Nothing to resume: the last run finished")
+            exit(0)
+        restore_run_options(args, run_status["options"])
 
-    if run_cleanup == "y":
-        if not run_script("aut_cleanup_wd_file.py", "Step 1: Running aut_cleanup_wd_file.py"):
-            exit(1)
+    try:
+        set_output_formats(args.output_format)
+        aut_columnar.engine = aut_columnar.check_engine(args.engine)
+    except (ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        exit(2)
+    aut_cleaup_eop_file.delta_output = aut_join_files.delta_output = args.delta
+
+    if args.daemon:
+        aut_daemon.run_daemon()
+        exit(0)
+
+    if not args.no_cache:
+        run_cache = aut_cache.RunCache()
+
+    if args.resume:
+        write_log(f"🔁 Resuming run {run_status['run_id']} at {aut_checkpoint.first_incomplete(run_status)}")
     else:
-        write_log("Skipped aut_cleanup_wd_file.py")
-        print("Skipped aut_cleanup_wd_file.py")
+        run_status = aut_checkpoint.start_run({name: getattr(args, name) for name in RUN_OPTIONS})
+
+    # Step 1: WD cleanup (asked only if it did not run yet)
+    done = resume_checkpoint(run_status, "wd", 1)
+    if done is not None:
+        wd_df, record = done
+        wd_keys, wd_key = record["wd_keys"], record["stage_key"]
+    else:
+        run_cleanup = input("Do you want to run aut_cleanup_wd_file.py? (y/n): ").strip().lower()
+
+        wd_df, wd_keys, wd_key = None, {}, None
+        if run_cleanup == "y":
+            ok, result = run_stage("aut_cleanup_wd_file.py", "Step 1: Running aut_cleanup_wd_file.py",
+                                   stage_cleanup_wd, args.persist_intermediates, args.batch)
+            if not ok:
+                aut_checkpoint.mark_failed(run_status, "wd", result)
+                finish(1)
+            wd_df, wd_keys, wd_key = result
+        else:
+            write_log("Skipped aut_cleanup_wd_file.py")
+            print("Skipped aut_cleanup_wd_file.py")
+        aut_checkpoint.save_stage(run_status, "wd", wd_df, wd_keys=wd_keys, stage_key=wd_key)
 
     # Step 2: Run EOP cleanup
-    if not run_script("aut_cleaup_eop_file.py", "Step 2: Running aut_cleaup_eop_file.py"):
-        exit(2)
+    done = resume_checkpoint(run_status, "eop", 2)
+    if done is not None:
+        # Step 3 reads SAP itself when it is not handed over
+        expanded_df, record = done
+        sap_df, expanded_path, eop_key = None, record["output"], record["stage_key"]
+    else:
+        ok, result = run_stage("aut_cleaup_eop_file.py", "Step 2: Running aut_cleaup_eop_file.py",
+                               stage_expand_sap, wd_df, wd_key)
+        if not ok:
+            aut_checkpoint.mark_failed(run_status, "eop", result)
+            finish(2)
+        sap_df, expanded_df, expanded_path, eop_key = result
+        aut_checkpoint.save_stage(run_status, "eop", expanded_df, output=expanded_path, stage_key=eop_key)
 
     # Step 3: Join files
-    if not run_script("aut_join_files.py", "Step 3: Running aut_join_files.py"):
-        exit(3)
+    ok, result = run_stage("aut_join_files.py", "Step 3: Running aut_join_files.py",
+                           stage_join, sap_df, expanded_df, expanded_path, eop_key)
+    if not ok:
+        aut_checkpoint.mark_failed(run_status, "join", result)
+        finish(3)
+    aut_checkpoint.save_stage(run_status, "join")
+
+    # Only now the exports count as processed: a failed run picks them up again
+    if wd_keys:
+        aut_cleanup_wd_file.mark_processed(wd_keys)
+    aut_checkpoint.finish_run(run_status)
 
     print("\n[INFO] ✅  All steps completed successfully ✅")
     write_log("✅ All scripts completed successfully ✅")
+    finish(0)
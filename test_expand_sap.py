@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+import aut_cleaup_eop_file as eop
+import aut_columnar
+import aut_schema
+
+
+def expand_sap_by_day_loop(sap_df):
+    """The iterrows / build_row expansion of process_files before it was vectorized (reference)."""
+    sap_df = sap_df.copy()
+    sap_df["Start Date"] = pd.to_datetime(sap_df["Start Date"], errors="coerce")
+    sap_df["End Date"] = pd.to_datetime(sap_df["End Date"], errors="coerce")
+    sap_df = sap_df[
+        sap_df["Start Date"].notna()
+        & sap_df["End Date"].notna()
+        & (sap_df["End Date"] <= eop.max_valid_date)
+    ]
+
+    all_columns = sap_df.columns.tolist()
+    rows = []
+
+    def build_row(src_row, overrides: dict):
+        full_row = {col: src_row[col] if col in eop.required_columns else "-" for col in all_columns}
+        full_row.update(overrides)
+        return full_row
+
+    for _, row in sap_df.iterrows():
+        start = row["Start Date"]
+        end = row["End Date"]
+
+        if start == end:
+            rows.append(build_row(row, {
+                "Start Date": start,
+                "End Date": end,
+                "AbsenceDate_SAP": start,
+                "Key_SAP": f"{row['Personnel Number']}_{start.strftime('%Y%m%d')}",
+                "PY": None
+            }))
+        else:
+            for d in pd.date_range(start, end, freq="D"):
+                rows.append(build_row(row, {
+                    "Start Date": d,
+                    "End Date": d,
+                    "AbsenceDate_SAP": d,
+                    "Key_SAP": f"{row['Personnel Number']}_{d.strftime('%Y%m%d')}",
+                    "PY": None
+                }))
+
+    df = pd.DataFrame(rows)
+    if "PY" in df.columns:
+        df["PY"] = df["PY"].apply(lambda x: "Python script" if pd.isna(x) else x)
+    if "Key_SAP" in df.columns:
+        df = df.drop_duplicates(subset=["Key_SAP"], keep="first")
+    for c in ["Start", "End time"]:
+        if c in df.columns:
+            df[c] = df[c].astype(str).replace({":  :": "-"})
+
+    cols = df.columns.tolist()
+    for c in ["AbsenceDate_SAP", "Key_SAP", "PY"]:
+        if c in cols:
+            cols.remove(c)
+    cols.extend([c for c in ["AbsenceDate_SAP", "Key_SAP", "PY"] if c in df.columns])
+    df = df[cols]
+    return df.drop(columns=[c for c in ["AbsenceDate_SAP", "Key_SAP"] if c in df.columns])
+
+
+def sap_fixture():
+    rows = [
+        # Pers.No., Start Date, End Date, A/AType, Start
+        (101, "2025-03-03", "2025-03-03", "100", "08:00"),                      # single day
+        (102, "2025-03-03", "2025-03-07", "200", ":  :"),                       # multi day
+        (103, "2025-03-10", "2025-03-08", "100", ":  :"),                       # end < start: no rows
+        (104, "2025-03-03 08:00", "2025-03-05 07:00", "100", "08:00"),          # time of day
+        (104, "2025-03-04 13:00", "2025-03-04 17:00", "200", "13:00"),          # day 04.03. again, other time
+        (105, "2025-03-01", "2025-03-04", "100", ":  :"),                       # overlaps the next row
+        (105, "2025-03-03", "2025-03-06", "200", ":  :"),                       # duplicate Key_SAP 03.-04.
+        (101, "2025-03-03", "2025-03-03", "300", "10:00"),                      # exact duplicate day
+        (106, None, "2025-03-04", "100", ":  :"),                               # no start date: dropped
+    ]
+    return pd.DataFrame({
+        "Pers.No.": [r[0] for r in rows],
+        "Personnel Number": [r[0] for r in rows],
+        "Name": [f"Employee {r[0]}" for r in rows],
+        "CoCd": ["DE11"] * len(rows),
+        "Start Date": pd.to_datetime([r[1] for r in rows], format="ISO8601"),
+        "End Date": pd.to_datetime([r[2] for r in rows], format="ISO8601"),
+        "Start": [r[4] for r in rows],
+        "End time": [":  :"] * len(rows),
+        "A/AType": [r[3] for r in rows],
+        "Text": ["x"] * len(rows),
+    })
+
+
+@pytest.mark.parametrize("engine", aut_columnar.ENGINES)
+def test_expansion_matches_loop(engine, monkeypatch):
+    if engine == "columnar" and aut_columnar.duckdb is None:
+        pytest.skip("duckdb is not installed")
+    monkeypatch.setattr(aut_columnar, "engine", engine)
+    sap_df = sap_fixture()
+    expected = expand_sap_by_day_loop(sap_df)
+    result, removed = eop.expand_and_dedup(eop.sanitize_sap(aut_schema.apply_schema(sap_df, aut_schema.SAP_COLUMNS)))
+
+    assert removed == 0
+    assert len(expected) == 14
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True).astype(object),
+        expected.reset_index(drop=True).astype(object),
+    )